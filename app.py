@@ -1,6 +1,14 @@
 import dash
-from dash import html, dcc
+import diskcache
+from dash import html, dcc, DiskcacheManager
 import dash_bootstrap_components as dbc
+from upload_server import register_upload_routes
+from scoring_server import register_scoring_routes
+from db_pool import register_db_routes
+
+# Las tareas largas (limpieza, minería, exportación) corren como callbacks en segundo
+# plano, en procesos aparte, con su estado y resultado guardados en esta caché local
+background_callback_manager = DiskcacheManager(diskcache.Cache("./cache_tareas"))
 
 # Inicializar la aplicación
 app = dash.Dash(
@@ -10,16 +18,26 @@ app = dash.Dash(
         dbc.themes.BOOTSTRAP,
         "https://fonts.googleapis.com/css2?family=Poppins:wght@400;600&display=swap"
     ],
-    suppress_callback_exceptions=True  # permite callbacks entre páginas aunque el layout aún no se haya cargado
+    suppress_callback_exceptions=True,  # permite callbacks entre páginas aunque el layout aún no se haya cargado
+    background_callback_manager=background_callback_manager
 )
 app.title = "Sistema ETL Hotelería"
 
+# Rutas de carga por partes (archivos grandes sin pasar por base64)
+register_upload_routes(app.server)
+# Predicción en línea de reservas (POST /score) y sus latencias (GET /score/metrics)
+register_scoring_routes(app.server)
+# Salud de PostgreSQL y reutilización de conexiones del pool (GET /db/metrics)
+register_db_routes(app.server)
+
 # ✅ Declaración de Sto
 # res globales, afuera del Container
 app.layout = html.Div([
     # Almacenes de datos accesibles desde todas las páginas
     dcc.Store(id="stored-raw-data", storage_type="memory"),
     dcc.Store(id="clean-data-store", storage_type="memory"),
+    # Modo de la siguiente limpieza: "completo" (reemplaza todo) o "incremental" (agrega un lote)
+    dcc.Store(id="modo-carga", storage_type="session", data="completo"),
 
     
     # Contenedor visual principal
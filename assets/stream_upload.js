@@ -0,0 +1,93 @@
+// assets/stream_upload.js
+// Carga por partes: el archivo se envía en bloques directamente al servidor
+// (rutas /upload/*) en lugar de pasar por base64 dentro del callback de Dash.
+(function () {
+    var CHUNK_SIZE = 8 * 1024 * 1024;
+
+    function setProps(id, props) {
+        if (window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props(id, props);
+        }
+    }
+
+    function storageKey(file) {
+        return "upload:" + file.name + ":" + file.size + ":" + file.lastModified;
+    }
+
+    async function postJson(url, body) {
+        var response = await fetch(url, {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify(body || {})
+        });
+        var data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        return data;
+    }
+
+    async function uploadFile(file) {
+        setProps("upload-progress", {value: 0, label: ""});
+        try {
+            // Si la misma carga quedó a medias, se reanuda desde lo ya recibido
+            var key = storageKey(file);
+            var init = await postJson("/upload/init", {
+                filename: file.name,
+                upload_id: window.localStorage.getItem(key)
+            });
+            window.localStorage.setItem(key, init.upload_id);
+
+            var offset = init.received;
+            while (offset < file.size) {
+                var end = Math.min(offset + CHUNK_SIZE, file.size);
+                var response = await fetch("/upload/" + init.upload_id + "?offset=" + offset, {
+                    method: "PUT",
+                    body: file.slice(offset, end)
+                });
+                var data = await response.json();
+                if (!response.ok && response.status !== 409) {
+                    throw new Error(data.error || response.statusText);
+                }
+                offset = data.received;
+                var percent = Math.round(100 * offset / file.size);
+                setProps("upload-progress", {value: percent, label: percent + "%"});
+            }
+
+            var summary = await postJson("/upload/" + init.upload_id + "/complete");
+            window.localStorage.removeItem(key);
+            setProps("stream-upload-result", {data: summary});
+        } catch (err) {
+            setProps("stream-upload-result", {data: {error: String(err.message || err)}});
+        }
+    }
+
+    document.addEventListener("click", function (event) {
+        if (event.target.closest && event.target.closest("#upload-data")) {
+            var input = document.createElement("input");
+            input.type = "file";
+            input.accept = ".csv,.xlsx,.xls,.json";
+            input.addEventListener("change", function () {
+                if (input.files.length) {
+                    uploadFile(input.files[0]);
+                }
+            });
+            input.click();
+        }
+    });
+
+    document.addEventListener("dragover", function (event) {
+        if (event.target.closest && event.target.closest("#upload-data")) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener("drop", function (event) {
+        if (event.target.closest && event.target.closest("#upload-data")) {
+            event.preventDefault();
+            if (event.dataTransfer.files.length) {
+                uploadFile(event.dataTransfer.files[0]);
+            }
+        }
+    });
+})();
@@ -0,0 +1,163 @@
+import argparse
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from data_analysis import CancellationPredictor, StayLengthEstimator, load_registered
+from data_store import DataStore
+from file_manager import FileManager
+from model_registry import ModelRegistry
+
+MODELOS = {
+    'cancelacion': (CancellationPredictor, 'pred_is_canceled'),
+    'estancia': (StayLengthEstimator, 'pred_total_nights'),
+}
+
+_worker_estimator = None
+
+
+def _init_worker(estimator):
+    # Cada proceso recibe el modelo una sola vez, no con cada bloque
+    global _worker_estimator
+    _worker_estimator = estimator
+
+
+def _score_chunk(chunk: pd.DataFrame):
+    return _worker_estimator.predict(chunk)
+
+
+def iter_source(source: str, columns: list, chunksize: int = 100_000):
+    """
+    Bloques de tamaño fijo desde el almacén intermedio ("store"), un CSV o una
+    consulta de PostgreSQL ("sql:SELECT ..."), leyendo solo las columnas pedidas.
+    La consulta se lee con un cursor con nombre (del lado del servidor), como en
+    PostgresStore.iter_chunks: el cliente tiene a lo más un bloque en memoria.
+    """
+    if source == "store":
+        yield from DataStore().iter_chunks(columns=columns, chunksize=chunksize)
+    elif source.lower().startswith("sql:"):
+        with FileManager().connection() as conn:
+            cursor = conn.cursor(name=f"puntuacion_{uuid.uuid4().hex[:8]}")
+            cursor.itersize = chunksize
+            try:
+                cursor.execute(source[len("sql:"):])
+                while True:
+                    rows = cursor.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    names = [desc[0] for desc in cursor.description]
+                    chunk = pd.DataFrame.from_records(rows, columns=names, coerce_float=True)
+                    yield chunk[[col for col in columns if col in chunk.columns]]
+            finally:
+                cursor.close()
+                conn.rollback()
+    elif os.path.splitext(source)[1].lower() == ".csv":
+        header = pd.read_csv(source, nrows=0).columns
+        usecols = [col for col in columns if col in header]
+        yield from pd.read_csv(source, usecols=usecols, chunksize=chunksize)
+    else:
+        raise ValueError("Fuente no soportada. Use 'store', un CSV o 'sql:<consulta>'.")
+
+
+def write_output(chunks, output: str) -> int:
+    """
+    Escribe los bloques con predicciones conforme llegan: CSV, Arrow (.arrow) o
+    una tabla de PostgreSQL ("postgresql:<tabla>").
+    """
+    if output.lower().startswith("postgresql:"):
+        fm = FileManager()
+        fm.table_name = output[len("postgresql:"):]
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+        fm.save_chunks_to_postgresql_copy(counted())
+        return rows
+
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".arrow":
+        return DataStore(output).save_chunks(chunks)
+    elif extension == ".csv":
+        rows = 0
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(output, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            rows += len(chunk)
+        return rows
+    raise ValueError("Salida no soportada. Use CSV, .arrow o 'postgresql:<tabla>'.")
+
+
+class BatchScorer:
+    """
+    Puntuación por lotes con un estimador ya entrenado (CancellationPredictor o
+    StayLengthEstimator). Los bloques se reparten entre varios procesos y las
+    predicciones salen en el mismo orden de entrada, con un número acotado de
+    bloques en memoria a la vez.
+    """
+    def __init__(self, estimator, output_column: str, n_jobs: int = None):
+        self.estimator = estimator
+        self.output_column = output_column
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.stats = None
+
+    def iter_scored(self, chunks):
+        start = time.perf_counter()
+        rows = 0
+        in_flight = deque()
+        with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker,
+                                 initargs=(self.estimator,)) as pool:
+            for chunk in chunks:
+                in_flight.append((chunk, pool.submit(_score_chunk, chunk)))
+                # Como máximo dos bloques por proceso esperando
+                while len(in_flight) >= 2 * self.n_jobs:
+                    done_chunk, future = in_flight.popleft()
+                    rows += len(done_chunk)
+                    yield done_chunk.assign(**{self.output_column: future.result()})
+            while in_flight:
+                done_chunk, future = in_flight.popleft()
+                rows += len(done_chunk)
+                yield done_chunk.assign(**{self.output_column: future.result()})
+
+        seconds = time.perf_counter() - start
+        self.stats = {
+            'rows': rows,
+            'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds > 0 else float('inf'),
+        }
+
+    def score(self, chunks, output: str) -> dict:
+        write_output(self.iter_scored(chunks), output)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntuación por lotes de reservas.")
+    parser.add_argument("modelo", choices=list(MODELOS))
+    parser.add_argument("--source", default="store", help="'store', ruta CSV o 'sql:<consulta>'")
+    parser.add_argument("--output", required=True, help="ruta CSV/.arrow o 'postgresql:<tabla>'")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--id-columns", nargs="*", default=[], help="columnas a copiar a la salida")
+    args = parser.parse_args()
+
+    # El modelo se toma del registro sin leer el almacén; si no está para los datos limpios
+    # actuales, se entrena una vez leyendo solo sus columnas
+    estimator_cls, output_column = MODELOS[args.modelo]
+    store = DataStore()
+    estimator = estimator_cls(registry=ModelRegistry(), dataset_key=store.stored_key())
+    if not load_registered(estimator):
+        estimator.train_and_report(store.load(columns=estimator.feature_cols + [estimator.target_col]))
+
+    columns = list(dict.fromkeys(args.id_columns + estimator.feature_cols))
+    scorer = BatchScorer(estimator, output_column, n_jobs=args.n_jobs)
+    stats = scorer.score(iter_source(args.source, columns, args.chunksize), args.output)
+    print(f"✅ {stats['rows']} filas puntuadas en {stats['seconds']:.2f} s "
+          f"({stats['rows_per_second']:.0f} filas/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
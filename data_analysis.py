@@ -4,100 +4,442 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.cluster import KMeans
-from sklearn.metrics import classification_report, accuracy_score, mean_absolute_error
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import classification_report, accuracy_score, mean_absolute_error, silhouette_score
+from joblib import Parallel, delayed
+from model_registry import ModelRegistry
+from eda_summary import summarize_chunks
+
+
+def prepare_features(new_data: pd.DataFrame, feature_cols: list):
+    """
+    Selecciona y convierte a float las columnas que usa el modelo. Devuelve la
+    matriz de las filas completas y la máscara de esas filas; las filas con algún
+    valor faltante no se predicen.
+    """
+    missing = [col for col in feature_cols if col not in new_data.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas para el modelo: {missing}")
+    X = new_data[feature_cols].apply(pd.to_numeric, errors='coerce').astype('float64')
+    valid = X.notna().all(axis=1).to_numpy()
+    return X[valid], valid
+
+
+def _predict_complete_rows(model, new_data: pd.DataFrame, feature_cols: list) -> np.ndarray:
+    # Las filas incompletas quedan como NaN en lugar de hacer fallar todo el lote
+    X, valid = prepare_features(new_data, feature_cols)
+    predictions = np.full(len(new_data), np.nan)
+    if valid.any():
+        predictions[valid] = model.predict(X)
+    return predictions
+
+
+# La silueta es cuadrática en filas: se evalúa sobre una muestra pequeña
+SILHOUETTE_ROWS = 2000
+
+
+def _fit_k(X: np.ndarray, k: int, silhouette_rows: int) -> dict:
+    # Un punto del barrido de k: inercia y silueta sobre la misma submuestra
+    kmeans = MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3).fit(X)
+    silhouette = silhouette_score(X, kmeans.labels_, sample_size=min(silhouette_rows, len(X)), random_state=42)
+    return {'k': k, 'inertia': float(kmeans.inertia_), 'silhouette': float(silhouette)}
+
+
+def load_registered(estimator) -> bool:
+    """
+    Carga en el estimador (CancellationPredictor o StayLengthEstimator) el modelo ya
+    registrado para su dataset, sin leer datos. Devuelve False si no hay uno.
+    """
+    if estimator.registry is None:
+        return False
+    entry = estimator.registry.fetch(
+        type(estimator).__name__, estimator.dataset_key, estimator.feature_cols, estimator.params)
+    if entry is None:
+        return False
+    estimator.model, estimator.metadata = entry
+    return True
+
+
+def _train_with_registry(registry, dataset_key, name, features, params, train_fn):
+    # Sin registro se entrena siempre y no se guarda nada en disco
+    if registry is None:
+        return ModelRegistry().fetch_or_train(name, None, features, params, train_fn)
+    return registry.fetch_or_train(name, dataset_key, features, params, train_fn)
+
 
 class CancellationPredictor:
     """
     Clase para predecir la cancelación de reservas (columna 'is_canceled')
     usando un modelo de Regresión Logística.
+    Con un ModelRegistry y la huella del dataset, el modelo se reutiliza entre visitas.
     """
-    def __init__(self):
+    feature_cols = ['lead_time', 'previous_cancellations', 'adr', 'total_nights']
+    target_col = 'is_canceled'
+    params = {'max_iter': 1000, 'test_size': 0.2, 'random_state': 42}
+
+    def __init__(self, registry: ModelRegistry = None, dataset_key=None):
         self.model = None
+        self.metadata = None
+        self.registry = registry
+        self.dataset_key = dataset_key
 
     def train_and_report(self, df: pd.DataFrame) -> str:
-        feature_cols = ['lead_time', 'previous_cancellations', 'adr', 'total_nights']
-        df_model = df.dropna(subset=feature_cols + ['is_canceled'])
-        X = df_model[feature_cols]
-        y = df_model['is_canceled']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        self.model = LogisticRegression(max_iter=1000)
-        self.model.fit(X_train, y_train)
-        y_pred = self.model.predict(X_test)
-        report = classification_report(y_test, y_pred)
-        acc = accuracy_score(y_test, y_pred)
-        return f"=== Resultados de la predicción de cancelaciones ===\n{report}\nExactitud/accuracy: {acc:.4f}\n"
+        feature_cols = self.feature_cols
+
+        def train():
+            df_model = df.dropna(subset=feature_cols + ['is_canceled'])
+            X = df_model[feature_cols]
+            y = df_model['is_canceled']
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            model = LogisticRegression(max_iter=1000)
+            model.fit(X_train, y_train)
+            y_pred = model.predict(X_test)
+            report = classification_report(y_test, y_pred)
+            acc = accuracy_score(y_test, y_pred)
+            text = f"=== Resultados de la predicción de cancelaciones ===\n{report}\nExactitud/accuracy: {acc:.4f}\n"
+            return model, text, {'accuracy': float(acc)}, len(df_model)
+
+        self.model, self.metadata = _train_with_registry(
+            self.registry, self.dataset_key, 'CancellationPredictor', feature_cols, self.params, train)
+        return self.metadata['report']
 
 
     def predict(self, new_data: pd.DataFrame) -> np.ndarray:
         if self.model is None:
             raise Exception("El modelo no ha sido entrenado. Llama a train_model() primero.")
-        return self.model.predict(new_data)
+        return _predict_complete_rows(self.model, new_data, self.feature_cols)
+
+    def predict_proba(self, new_data: pd.DataFrame) -> np.ndarray:
+        # Probabilidad de cancelación (clase 1); NaN en filas incompletas
+        if self.model is None:
+            raise Exception("El modelo no ha sido entrenado. Llama a train_model() primero.")
+        X, valid = prepare_features(new_data, self.feature_cols)
+        probabilities = np.full(len(new_data), np.nan)
+        if valid.any():
+            positive = list(self.model.classes_).index(1)
+            probabilities[valid] = self.model.predict_proba(X)[:, positive]
+        return probabilities
 
 
 class StayLengthEstimator:
     """
     Clase para estimar la duración de la estancia ('total_nights')
     utilizando RandomForestRegressor.
+    Con un ModelRegistry y la huella del dataset, el modelo se reutiliza entre visitas.
     """
-    def __init__(self):
+    feature_cols = ['lead_time', 'adr', 'previous_bookings_not_canceled', 'required_car_parking_spaces']
+    target_col = 'total_nights'
+    params = {'n_estimators': 100, 'test_size': 0.2, 'random_state': 42}
+
+    def __init__(self, n_jobs=None, registry: ModelRegistry = None, dataset_key=None):
+        self.n_jobs = n_jobs
         self.model = None
+        self.metadata = None
+        self.registry = registry
+        self.dataset_key = dataset_key
 
     def train_and_report(self, df: pd.DataFrame) -> str:
-        feature_cols = ['lead_time', 'adr', 'previous_bookings_not_canceled', 'required_car_parking_spaces']
-        df_model = df.dropna(subset=feature_cols + ['total_nights'])
-        X = df_model[feature_cols]
-        y = df_model['total_nights']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
-        y_pred = self.model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        return f"=== Resultados de la estimación de duración de estancia ===\nMAE (Mean Absolute Error): {mae:.2f} noches\n"
+        feature_cols = self.feature_cols
+
+        def train():
+            df_model = df.dropna(subset=feature_cols + ['total_nights'])
+            X = df_model[feature_cols]
+            y = df_model['total_nights']
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=self.n_jobs)
+            model.fit(X_train, y_train)
+            y_pred = model.predict(X_test)
+            mae = mean_absolute_error(y_test, y_pred)
+            text = f"=== Resultados de la estimación de duración de estancia ===\nMAE (Mean Absolute Error): {mae:.2f} noches\n"
+            return model, text, {'mae': float(mae)}, len(df_model)
+
+        # n_jobs no cambia el modelo, por eso no forma parte de la llave del registro
+        self.model, self.metadata = _train_with_registry(
+            self.registry, self.dataset_key, 'StayLengthEstimator', feature_cols, self.params, train)
+        return self.metadata['report']
 
 
     def predict(self, new_data: pd.DataFrame) -> np.ndarray:
         if self.model is None:
             raise Exception("El modelo no ha sido entrenado. Llama a train_model() primero.")
-        return self.model.predict(new_data)
+        return _predict_complete_rows(self.model, new_data, self.feature_cols)
 
 
 class CustomerSegmentation:
     """
-    Clase para segmentar clientes utilizando K-Means.
+    Clase para segmentar clientes con K-Means por mini-lotes (MiniBatchKMeans).
+    Las columnas se estandarizan y el modelo se ajusta recorriendo los datos por
+    bloques, así que puede usar el dataset completo con memoria acotada.
+    Con un ModelRegistry y la huella del dataset, el modelo se reutiliza entre visitas.
     """
-    def __init__(self, n_clusters=4):
+    cluster_cols = ['lead_time', 'adr', 'total_nights']
+
+    def __init__(self, n_clusters=4, registry: ModelRegistry = None, dataset_key=None,
+                 batch_size: int = 10_000, n_epochs: int = 3,
+                 k_range=range(2, 11), sample_size: int = 20_000, n_jobs: int = None):
+        # n_clusters='auto' elige k con un barrido en paralelo (ver select_k)
         self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.n_epochs = n_epochs
+        self.k_range = list(k_range)
+        self.sample_size = sample_size
+        self.n_jobs = n_jobs
         self.kmeans = None
+        self.metadata = None
+        self.sweep = None
+        self.registry = registry
+        self.dataset_key = dataset_key
+
+    def _sample(self, make_chunks) -> np.ndarray:
+        # Muestra uniforme de tamaño fijo en una pasada: se conservan las filas con las
+        # claves aleatorias más pequeñas
+        rng = np.random.default_rng(42)
+        sample, keys = None, None
+        for chunk in make_chunks():
+            X, _ = prepare_features(chunk, self.cluster_cols)
+            if not len(X):
+                continue
+            X = X.to_numpy()
+            new_keys = rng.random(len(X))
+            sample = X if sample is None else np.vstack([sample, X])
+            keys = new_keys if keys is None else np.concatenate([keys, new_keys])
+            if len(keys) > self.sample_size:
+                keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+                sample, keys = sample[keep], keys[keep]
+        if sample is None:
+            raise ValueError("No hay filas completas para segmentar.")
+        return sample
+
+    def select_k(self, make_chunks) -> int:
+        """
+        Barre self.k_range en paralelo sobre una submuestra estandarizada y elige el k
+        con mejor silueta. El barrido (k, inercia, silueta) queda en self.sweep y se
+        guarda en el registro, así que por dataset solo se calcula una vez.
+        """
+        def train():
+            X = StandardScaler().fit_transform(self._sample(make_chunks))
+            ks = [k for k in self.k_range if k < len(X)]
+            sweep = Parallel(n_jobs=self.n_jobs or -1)(
+                delayed(_fit_k)(X, k, SILHOUETTE_ROWS) for k in ks)
+            best = max(sweep, key=lambda point: point['silhouette'])
+            text = f"k={best['k']} (silueta {best['silhouette']:.3f}) entre k={ks[0]}..{ks[-1]}."
+            return sweep, text, {'best_k': best['k']}, len(X)
+
+        params = {'k_range': self.k_range, 'sample_size': self.sample_size,
+                  'silhouette_rows': SILHOUETTE_ROWS, 'random_state': 42}
+        self.sweep, metadata = _train_with_registry(
+            self.registry, self.dataset_key, 'CustomerSegmentationSweep', self.cluster_cols, params, train)
+        self.n_clusters = metadata['metrics']['best_k']
+        return self.n_clusters
+
+    def _fit_stream(self, make_chunks):
+        # Primera pasada: media y desviación para escalar; luego varias épocas de partial_fit
+        # y una pasada final que mide la inercia sobre todas las filas (la de partial_fit
+        # solo es la del último mini-lote)
+        scaler = StandardScaler()
+        rows = 0
+        for chunk in make_chunks():
+            X, _ = prepare_features(chunk, self.cluster_cols)
+            if len(X):
+                scaler.partial_fit(X)
+                rows += len(X)
+        if rows < self.n_clusters:
+            raise ValueError(f"Se necesitan al menos {self.n_clusters} filas completas para segmentar.")
+
+        kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=42,
+                                 batch_size=self.batch_size, n_init=3)
+        self._partial_fit_epochs(kmeans, scaler, make_chunks, self.n_epochs)
+        inertia = sum(-kmeans.score(X) for X in self._iter_scaled(scaler, make_chunks))
+        return Pipeline([('scaler', scaler), ('kmeans', kmeans)]), rows, float(inertia)
+
+    def _iter_scaled(self, scaler, make_chunks):
+        for chunk in make_chunks():
+            X, _ = prepare_features(chunk, self.cluster_cols)
+            if len(X):
+                yield scaler.transform(X)
+
+    def _partial_fit_epochs(self, kmeans, scaler, make_chunks, n_epochs):
+        for _ in range(n_epochs):
+            pending = None
+            for X in self._iter_scaled(scaler, make_chunks):
+                pending = X if pending is None else np.vstack([pending, X])
+                # partial_fit exige al menos n_clusters filas en el primer lote
+                while len(pending) >= self.batch_size:
+                    kmeans.partial_fit(pending[:self.batch_size])
+                    pending = pending[self.batch_size:]
+            if pending is not None and len(pending) >= kmeans.n_clusters:
+                kmeans.partial_fit(pending)
+
+    def fit_chunks(self, make_chunks, rows: int = None):
+        """
+        Entrena con bloques de datos. make_chunks() debe devolver un iterador nuevo en
+        cada llamada (por ejemplo, lambda: store.iter_chunks(columns=...)), porque el
+        ajuste recorre los datos varias veces.
+        """
+        if self.n_clusters == 'auto':
+            self.select_k(make_chunks)
+
+        def train():
+            model, n_rows, inertia = self._fit_stream(make_chunks)
+            text = f"Se formaron {self.n_clusters} clústeres con {n_rows} filas."
+            return model, text, {'inertia': inertia}, n_rows
+
+        # La llave incluye las filas usadas, para distinguir una muestra del dataset completo
+        params = {'n_clusters': self.n_clusters, 'random_state': 42, 'rows': rows,
+                  'batch_size': self.batch_size, 'n_epochs': self.n_epochs, 'method': 'minibatch'}
+        self.kmeans, self.metadata = _train_with_registry(
+            self.registry, self.dataset_key, 'CustomerSegmentation', self.cluster_cols, params, train)
+        return self
 
     def segment(self, df: pd.DataFrame) -> pd.DataFrame:
-        cols_for_clustering = ['lead_time', 'adr', 'total_nights']
-        df_cluster = df.dropna(subset=cols_for_clustering).copy()
-        X = df_cluster[cols_for_clustering]
-        self.kmeans = KMeans(n_clusters=self.n_clusters, random_state=42)
-        df_cluster['cluster'] = self.kmeans.fit_predict(X)
+        df_cluster = df.dropna(subset=self.cluster_cols).copy()
+        self.fit_chunks(
+            lambda: (df_cluster.iloc[i:i + self.batch_size] for i in range(0, len(df_cluster), self.batch_size)),
+            rows=len(df_cluster))
+        df_cluster['cluster'] = self.predict_cluster(df_cluster)
         print("=== Resultados de la Segmentación de Clientes (K-Means) ===")
         print(f"Se formaron {self.n_clusters} clústeres.")
         print(df_cluster['cluster'].value_counts())
         return df_cluster
 
     def predict_cluster(self, new_data: pd.DataFrame) -> np.ndarray:
+        # Asigna clúster a todas las filas; las incompletas quedan en -1
+        if self.kmeans is None:
+            raise Exception("Primero ejecuta segment() para entrenar el modelo K-Means.")
+        X, valid = prepare_features(new_data, self.cluster_cols)
+        clusters = np.full(len(new_data), -1, dtype=np.int64)
+        if valid.any():
+            clusters[valid] = self.kmeans.predict(X)
+        return clusters
+
+    def micro_clusters(self, make_chunks, n_micro: int = 100) -> pd.DataFrame:
+        """
+        Resume todas las filas en n_micro micro-clústeres (K-Means por mini-lotes en la
+        misma escala del modelo). Devuelve los centroides escalados, en columnas
+        '<col>_std', junto con sus valores originales y el número de clientes de cada
+        uno; sirve para construir el dendrograma sin calcular distancias entre filas.
+        """
+        if self.kmeans is None:
+            raise Exception("Primero ejecuta segment() para entrenar el modelo K-Means.")
+        scaler = self.kmeans.named_steps['scaler']
+        rows = int(scaler.n_samples_seen_) if np.ndim(scaler.n_samples_seen_) == 0 else int(scaler.n_samples_seen_[0])
+        n_micro = min(n_micro, rows)
+
+        def train():
+            micro = MiniBatchKMeans(n_clusters=n_micro, random_state=42,
+                                    batch_size=self.batch_size, n_init=1)
+            self._partial_fit_epochs(micro, scaler, make_chunks, 1)
+            counts = np.zeros(n_micro, dtype=np.int64)
+            for X in self._iter_scaled(scaler, make_chunks):
+                counts += np.bincount(micro.predict(X), minlength=n_micro)
+            text = f"{n_micro} micro-clústeres sobre {rows} filas."
+            return micro, text, {'counts': counts.tolist()}, rows
+
+        params = {'n_micro': n_micro, 'random_state': 42, 'batch_size': self.batch_size,
+                  'scaler_mean': [round(float(m), 6) for m in scaler.mean_]}
+        micro, metadata = _train_with_registry(
+            self.registry, self.dataset_key, 'CustomerMicroClusters', self.cluster_cols, params, train)
+
+        scaled = micro.cluster_centers_
+        result = pd.DataFrame(scaler.inverse_transform(scaled), columns=self.cluster_cols)
+        for i, col in enumerate(self.cluster_cols):
+            result[f"{col}_std"] = scaled[:, i]
+        result['clientes'] = metadata['metrics']['counts']
+        return result[result['clientes'] > 0].reset_index(drop=True)
+
+    def centers(self) -> pd.DataFrame:
+        # Centroides en las unidades originales de cada columna
         if self.kmeans is None:
             raise Exception("Primero ejecuta segment() para entrenar el modelo K-Means.")
-        return self.kmeans.predict(new_data)
+        scaled = self.kmeans.named_steps['kmeans'].cluster_centers_
+        centers = self.kmeans.named_steps['scaler'].inverse_transform(scaled)
+        return pd.DataFrame(centers, columns=self.cluster_cols).rename_axis('cluster').reset_index()
+
+
+MONTHS = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
+    'July': 7, 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12,
+}
 
 
 class TemporalAnalysis:
     """
-    Clase para el análisis de temporalidad (demanda por mes/año).
+    Clase para el análisis de temporalidad: reservas y tasa de cancelación por
+    periodo (mensual, semanal o diario). Trabaja con códigos enteros de año/mes/día
+    y un groupby vectorizado; no modifica el DataFrame recibido.
     """
-    def monthly_demand(self, df: pd.DataFrame) -> pd.DataFrame:
-        if 'arrival_date_year' not in df.columns or 'arrival_date_month' not in df.columns:
+    @staticmethod
+    def month_codes(months: pd.Series) -> np.ndarray:
+        # Acepta nombres en inglés ("August") o números de mes; se traduce una vez por valor distinto
+        codes, uniques = pd.factorize(months)
+        uniques = pd.Series(uniques)
+        numbers = uniques.map(MONTHS).astype('float64').fillna(
+            pd.to_numeric(uniques.astype('object'), errors='coerce')).to_numpy()
+        return np.where(codes >= 0, numbers[codes], np.nan)
+
+    def demand(self, df: pd.DataFrame, freq: str = 'M') -> pd.DataFrame:
+        """
+        Reservas, cancelaciones y tasa de cancelación por periodo, con un PeriodIndex
+        ordenado cronológicamente. freq: 'M' (mes), 'W' (semana) o 'D' (día).
+        """
+        required = ['arrival_date_year', 'arrival_date_month']
+        if freq != 'M':
+            required.append('arrival_date_day_of_month')
+        if any(col not in df.columns for col in required):
             raise Exception("No existen columnas de año/mes para el análisis temporal.")
-        df['year_month'] = df['arrival_date_year'].astype(str) + "-" + df['arrival_date_month'].astype(str)
-        demand_by_month = df.groupby('year_month')['is_canceled'].count().reset_index(name='total_reservas')
+
+        year = pd.to_numeric(df['arrival_date_year'], errors='coerce').to_numpy(dtype='float64')
+        month = self.month_codes(df['arrival_date_month'])
+        # Ordinal del periodo mensual: meses desde 1970-01
+        keys = (year - 1970) * 12 + month - 1
+        valid = ~np.isnan(keys) & (month >= 1) & (month <= 12)
+        if freq != 'M':
+            # Ordinal diario: días desde 1970-01-01, descartando días fuera del mes
+            day = pd.to_numeric(df['arrival_date_day_of_month'], errors='coerce').to_numpy(dtype='float64')
+            month_start = np.where(valid, keys, 0).astype('int64').astype('datetime64[M]')
+            first_day = month_start.astype('datetime64[D]').astype('int64')
+            month_days = (month_start + 1).astype('datetime64[D]').astype('int64') - first_day
+            keys = first_day + day - 1
+            valid &= ~np.isnan(day) & (day >= 1) & (day <= month_days)
+
+        if 'is_canceled' in df.columns:
+            canceled = pd.to_numeric(df['is_canceled'], errors='coerce').to_numpy(dtype='float64')
+        else:
+            canceled = np.full(len(df), np.nan)
+        keys, canceled = keys[valid].astype('int64'), canceled[valid]
+        if not len(keys):
+            return pd.DataFrame(columns=['total_reservas', 'canceladas', 'tasa_cancelacion'],
+                                index=pd.PeriodIndex([], freq=freq, name='periodo'))
+
+        # Agregación por conteo de enteros: sin cadenas ni ordenamientos
+        offset = keys.min()
+        position = keys - offset
+        observed = ~np.isnan(canceled)
+        rows = np.bincount(position)
+        counted = np.bincount(position, weights=observed) if 'is_canceled' in df.columns else rows
+        cancellations = np.bincount(position, weights=np.where(observed, canceled, 0.0))
+        present = np.flatnonzero(rows)
+        demand = pd.DataFrame({
+            # Con is_canceled se cuentan sus valores, como antes; sin ella, las filas
+            'total_reservas': counted[present].astype('int64'),
+            'canceladas': cancellations[present],
+        }, index=pd.PeriodIndex.from_ordinals(present + offset, freq='M' if freq == 'M' else 'D'))
+        if freq not in ('M', 'D'):
+            demand = demand.groupby(demand.index.asfreq(freq)).sum()
+        demand['tasa_cancelacion'] = demand['canceladas'] / demand['total_reservas']
+        demand.index.name = 'periodo'
+        return demand
+
+    def monthly_demand(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Una fila por mes con year_month (Period), year y month enteros
+        demand = self.demand(df, freq='M')
+        demand_by_month = demand.reset_index().rename(columns={'periodo': 'year_month'})
+        demand_by_month.insert(1, 'year', demand.index.year)
+        demand_by_month.insert(2, 'month', demand.index.month)
         print("=== Demanda mensual (total de reservas) ===")
-        print(demand_by_month.sort_values('year_month'))
+        print(demand_by_month)
         return demand_by_month
 
     def plot_monthly_demand(self, demand_by_month: pd.DataFrame):
@@ -108,10 +450,45 @@ class TemporalAnalysis:
             return
         demand_by_month_sorted = demand_by_month.sort_values('year_month')
         plt.figure()
-        plt.plot(demand_by_month_sorted['year_month'], demand_by_month_sorted['total_reservas'], marker='o')
+        plt.plot(demand_by_month_sorted['year_month'].astype(str), demand_by_month_sorted['total_reservas'], marker='o')
         plt.title('Demanda Mensual (Total de Reservas)')
         plt.xlabel('Año-Mes')
         plt.ylabel('Cantidad de Reservas')
         plt.xticks(rotation=45)
         plt.tight_layout()
-        plt.show()
\ No newline at end of file
+        plt.show()
+
+
+def profile_from_summaries(summaries: dict, top_k: int = 5) -> pd.DataFrame:
+    # Una fila por columna a partir de resúmenes ya calculados (p. ej. los guardados por versión)
+    rows = []
+    for col, summary in summaries.items():
+        row = {'columna': col, 'tipo': summary.kind, 'conteo': summary.count, 'nulos': summary.nulls}
+        if summary.kind == "numeric":
+            row.update({
+                'media': summary.mean, 'desv_std': summary.std, 'min': summary.min,
+                'p25': summary.quantile(0.25), 'p50': summary.quantile(0.5),
+                'p75': summary.quantile(0.75), 'max': summary.max,
+            })
+        elif summary.kind == "datetime":
+            row.update({'min': str(summary.first), 'max': str(summary.last)})
+        else:
+            cardinality = f"{summary.cardinality}+" if summary.truncated else summary.cardinality
+            row.update({
+                'cardinalidad': cardinality,
+                'top': ", ".join(f"{value} ({n})" for value, n in summary.top(top_k)),
+            })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def profile_dataset(data, columns: list = None, top_k: int = 5) -> pd.DataFrame:
+    """
+    Perfil EDA de todas las columnas (o de las indicadas) en una sola pasada: conteo,
+    nulos, media, desviación, mínimo/máximo y cuantiles aproximados para las
+    numéricas; rango para las fechas; cardinalidad y categorías más frecuentes para las demás.
+    data puede ser un DataFrame o un iterable de bloques (por ejemplo,
+    DataStore().iter_chunks() o pd.read_csv(..., chunksize=...)).
+    """
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    return profile_from_summaries(summarize_chunks(chunks, columns), top_k=top_k)
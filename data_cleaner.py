@@ -1,9 +1,144 @@
+import hashlib
+import json
+import os
+import time
+import tracemalloc
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from schema_inference import SchemaInference
+from eda_summary import NumericSummary, CategoricalSummary
+
+# Incrementar cuando cambie el resultado de la limpieza para invalidar cachés
+PIPELINE_VERSION = "3"
+
+MEDIAN_COLUMNS = ['lead_time', 'adr', 'is_canceled']
+
+# Pasos registrados (métodos de DataCleaner) en su orden por defecto
+CLEANING_STEPS = {
+    'drop_duplicates': "🧹 Duplicados eliminados",
+    'standardize_dates': "📆 Fechas convertidas y filas con fechas inválidas eliminadas",
+    'fill_missing_values': "🧩 Valores nulos rellenados en columnas como 'country', 'children', etc.",
+    'advanced_imputation_knn': "🧠 Imputación avanzada (KNN)",
+    'create_new_columns': "➕ Columna 'total_nights' creada",
+    'validate_numeric_columns': "🔢 Columnas numéricas validadas y convertidas",
+    'drop_missing_targets': "🚫 Filas sin valor en 'is_canceled' eliminadas",
+    'drop_unused_columns': "🗑️ Columnas eliminadas: 'company', 'reservation_status'",
+    'compact_schema': "📦 Tipos compactos: enteros pequeños, float32 sin pérdida y categóricos",
+}
+
+
+def load_pipeline_spec(path: str) -> dict:
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8") as f:
+        if extension in ['.yaml', '.yml']:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML no está instalado. Usa 'pip install pyyaml' o una especificación JSON.")
+            return yaml.safe_load(f) or {}
+        elif extension == '.json':
+            return json.load(f)
+    raise ValueError("Formato de especificación no soportado. Use YAML o JSON.")
+
+
+def resolve_pipeline(spec=None) -> list:
+    """
+    Devuelve la lista ordenada de pasos a ejecutar. La especificación puede ser
+    None (orden por defecto), una lista de nombres o un dict {'steps': [...]} cuyos
+    elementos son nombres o dicts {'name': ..., 'enabled': bool}.
+    """
+    if spec is None:
+        return list(CLEANING_STEPS)
+    entries = spec.get('steps', []) if isinstance(spec, dict) else spec
+    steps = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            if not entry.get('enabled', True):
+                continue
+            entry = entry['name']
+        if entry not in CLEANING_STEPS:
+            raise ValueError(f"Paso de limpieza desconocido: {entry}")
+        steps.append(entry)
+    return steps
+
+
+def pipeline_version(steps: list) -> str:
+    # La versión incluye los pasos elegidos para que otra configuración no reutilice la caché
+    digest = hashlib.sha1(",".join(steps).encode("utf-8")).hexdigest()[:8]
+    return f"{PIPELINE_VERSION}-{digest}"
+
+
+def dtypes_from_kinds(kinds: dict) -> dict:
+    # Un tipo por columna que sirve para todos los bloques, según los tipos vistos en cada uno
+    dtypes = {}
+    for col, col_kinds in kinds.items():
+        if col_kinds <= {'i', 'u'}:
+            dtypes[col] = 'int64'
+        elif col_kinds <= {'i', 'u', 'f'}:
+            dtypes[col] = 'float64'
+        elif col_kinds == {'b'}:
+            dtypes[col] = 'bool'
+        else:
+            dtypes[col] = 'object'
+    return dtypes
+
 
 class DataCleaner:
-    def __init__(self, df: pd.DataFrame):
-        self.df = df.copy()
+    def __init__(self, df: pd.DataFrame, stats: dict = None, copy: bool = True):
+        # stats: estadísticas globales precalculadas (modo por bloques); si es None
+        # se calculan sobre el propio DataFrame
+        self.df = df.copy() if copy else df
+        self.stats = stats
+        self.report = None
+        self.column_memory = None
+
+    def run(self, steps: list = None, track_memory: bool = True, progress=None) -> dict:
+        """
+        Ejecuta los pasos indicados (por defecto, todos los registrados) y devuelve
+        un reporte con tiempo, filas de entrada/salida y pico de memoria de cada paso.
+        progress(hechos, total, paso) se llama al terminar cada paso.
+        """
+        steps = list(CLEANING_STEPS) if steps is None else steps
+        started_tracing = track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        step_reports = []
+        start_total = time.perf_counter()
+        try:
+            for name in steps:
+                rows_in = len(self.df)
+                if track_memory:
+                    tracemalloc.reset_peak()
+                    memory_before = tracemalloc.get_traced_memory()[0]
+                start = time.perf_counter()
+                getattr(self, name)()
+                seconds = time.perf_counter() - start
+                peak_delta = tracemalloc.get_traced_memory()[1] - memory_before if track_memory else None
+                step_reports.append({
+                    'step': name,
+                    'seconds': seconds,
+                    'rows_in': rows_in,
+                    'rows_out': len(self.df),
+                    'peak_memory_bytes': peak_delta,
+                })
+                if progress is not None:
+                    progress(len(step_reports), len(steps), name)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        self.report = {
+            'pipeline_version': pipeline_version(steps),
+            'steps': step_reports,
+            'rows_in': step_reports[0]['rows_in'] if step_reports else len(self.df),
+            'rows_out': len(self.df),
+            'total_seconds': time.perf_counter() - start_total,
+        }
+        if self.column_memory is not None:
+            self.report['column_memory'] = self.column_memory
+        return self.report
 
     def drop_duplicates(self):
         self.df.drop_duplicates(inplace=True)
@@ -16,19 +151,28 @@ class DataCleaner:
 
     def fill_missing_values(self):
         if 'children' in self.df.columns:
-            self.df['children'].fillna(0, inplace=True)
+            self.df['children'] = self.df['children'].fillna(0)
 
         if 'country' in self.df.columns:
-            top_country = self.df['country'].mode()[0]
-            self.df['country'].fillna(top_country, inplace=True)
+            if self.stats is not None:
+                top_country = self.stats.get('country_mode')
+            else:
+                top_country = self.df['country'].mode()[0]
+            if top_country is not None:
+                self.df['country'] = self.df['country'].fillna(top_country)
 
         for col in ['agent', 'company']:
             if col in self.df.columns:
-                self.df[col].fillna(-1, inplace=True)
+                self.df[col] = self.df[col].fillna(-1)
 
-        for col in ['lead_time', 'adr', 'is_canceled']:
+        for col in MEDIAN_COLUMNS:
             if col in self.df.columns:
-                self.df[col].fillna(self.df[col].median(), inplace=True)
+                if self.stats is not None:
+                    median = self.stats['medians'].get(col)
+                else:
+                    median = self.df[col].median()
+                if pd.notna(median):
+                    self.df[col] = self.df[col].fillna(median)
 
     def advanced_imputation_knn(self):
         # (opcional)
@@ -44,14 +188,17 @@ class DataCleaner:
         for col in columnas_numericas:
             if col in self.df.columns:
                 self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
+                # Por bloques, un mismo tipo en todos los bloques aunque alguno no tenga nulos
+                if self.stats is not None and self.stats['dtypes'].get(col) == 'object':
+                    self.df[col] = self.df[col].astype('float64')
+
+        # En modo por bloques los tipos ya se decidieron globalmente en la primera pasada
+        if self.stats is not None:
+            return
 
-        # También validar cualquier columna que sea tipo object pero que parezca número
-        for col in self.df.columns:
-            if self.df[col].dtype == 'object':
-                try:
-                    self.df[col] = pd.to_numeric(self.df[col], errors='ignore')
-                except:
-                    pass
+        # Columnas de texto: se infiere el tipo con una muestra y solo se convierten las que califican.
+        # Los categóricos y la reducción de tipos numéricos se aplican en compact_schema
+        SchemaInference().apply(self.df, categorical=False)
 
     def drop_missing_targets(self):
         if 'is_canceled' in self.df.columns:
@@ -63,5 +210,258 @@ class DataCleaner:
             if col in self.df.columns:
                 self.df.drop(columns=[col], inplace=True)
 
+    def compact_schema(self):
+        # Por bloques cada bloque elegiría tipos distintos: StreamingCleaner decide los tipos
+        # compactos con toda la primera pasada y los aplica al escribir (compact_dtypes)
+        if self.stats is not None:
+            return
+        self.column_memory = SchemaInference().compact(self.df)
+
     def get_dataframe(self):
         return self.df
+
+
+class StreamingCleaner:
+    """
+    Ejecuta la misma limpieza de DataCleaner sobre un CSV por bloques, sin cargar
+    el archivo completo en memoria.
+
+    Una primera pasada ligera calcula lo que los pasos necesitan de todo el archivo:
+    los duplicados entre bloques (por hash de fila), la moda de 'country', las
+    medianas de MEDIAN_COLUMNS y un tipo único por columna. La segunda pasada es un
+    generador de bloques limpios que se escriben de forma incremental.
+
+    Con el paso compact_schema, la primera pasada también resume cada columna
+    (rango, nulos y si es entera, o cardinalidad en los textos) y con eso se
+    deciden los tipos compactos de todo el archivo (compact_dtypes): cada bloque
+    limpio se convierte a ellos, con las mismas categorías en todos los bloques.
+    """
+    def __init__(self, file_path: str, chunksize: int = 100_000, steps: list = None):
+        self.file_path = file_path
+        self.chunksize = chunksize
+        self.steps = list(CLEANING_STEPS) if steps is None else steps
+        self.stats = None
+        self.report = None
+        self.compact_dtypes = None
+        self._keep_masks = None
+        self._profiles = None
+
+    def _read_chunks(self, **kwargs):
+        return pd.read_csv(self.file_path, chunksize=self.chunksize, **kwargs)
+
+    @staticmethod
+    def _row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+        # int y float se normalizan para que un mismo valor tenga el mismo hash en todos los bloques
+        normalized = chunk.apply(
+            lambda s: s.astype('float64') if pd.api.types.is_numeric_dtype(s) else s)
+        return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+    def compute_stats(self) -> dict:
+        start = time.perf_counter()
+        seen = np.empty(0, dtype=np.uint64)
+        keep_masks = []
+        country_counts = pd.Series(dtype='int64')
+        # Resúmenes combinables: memoria acotada aunque el archivo tenga millones de filas
+        median_summaries = {col: NumericSummary() for col in MEDIAN_COLUMNS}
+        kinds = {}
+        profiles, float32_exact = {}, {}
+
+        for chunk in self._read_chunks():
+            for col, dtype in chunk.dtypes.items():
+                kinds.setdefault(col, set()).add(dtype.kind)
+
+            hashes = self._row_hashes(chunk)
+            repeated = pd.Series(hashes).duplicated().to_numpy().copy()
+            if len(seen):
+                pos = np.searchsorted(seen, hashes).clip(max=len(seen) - 1)
+                repeated |= seen[pos] == hashes
+            keep = ~repeated
+            keep_masks.append(keep)
+            seen = np.sort(np.concatenate([seen, hashes[keep]]), kind='mergesort')
+
+            # Igual que en DataCleaner: las estadísticas se toman tras quitar duplicados y fechas inválidas
+            valid = keep.copy()
+            if 'reservation_status_date' in chunk.columns:
+                valid &= pd.to_datetime(chunk['reservation_status_date'], errors='coerce').notna().to_numpy()
+            if 'country' in chunk.columns:
+                country_counts = country_counts.add(
+                    chunk.loc[valid, 'country'].value_counts(), fill_value=0)
+            for col in MEDIAN_COLUMNS:
+                if col in chunk.columns:
+                    median_summaries[col].update(pd.to_numeric(chunk.loc[valid, col], errors='coerce'))
+            if 'compact_schema' in self.steps:
+                self._profile(chunk.loc[valid], profiles, float32_exact)
+
+        dtypes = dtypes_from_kinds(kinds)
+
+        medians = {col: summary.quantile(0.5) for col, summary in median_summaries.items() if summary.count}
+
+        self.stats = {
+            'country_mode': country_counts.idxmax() if len(country_counts) else None,
+            'medians': medians,
+            'dtypes': dtypes,
+            'rows_in': int(sum(len(mask) for mask in keep_masks)),
+            'duplicates': int(sum((~mask).sum() for mask in keep_masks)),
+            'seconds': time.perf_counter() - start,
+        }
+        self._keep_masks = keep_masks
+        self._profiles = (profiles, float32_exact)
+        if 'compact_schema' in self.steps:
+            self.compact_dtypes = self._compact_dtypes()
+        return self.stats
+
+    @staticmethod
+    def _profile(chunk: pd.DataFrame, profiles: dict, float32_exact: dict):
+        # Resumen por columna de las filas que sobreviven a la limpieza
+        for col, dtype in chunk.dtypes.items():
+            if pd.api.types.is_bool_dtype(dtype):
+                continue
+            if pd.api.types.is_numeric_dtype(dtype):
+                profiles.setdefault((col, 'numeric'), NumericSummary()).update(chunk[col])
+                values = chunk[col].to_numpy(dtype='float64')
+                exact = np.array_equal(values.astype('float32').astype('float64'), values, equal_nan=True)
+                float32_exact[col] = float32_exact.get(col, True) and exact
+            else:
+                profiles.setdefault((col, 'text'), CategoricalSummary()).update(chunk[col])
+
+    def _envelope(self) -> pd.DataFrame:
+        """
+        Filas sintéticas que cubren lo que la limpieza puede producir: una con el mínimo
+        de cada columna, otra con el máximo y, por cada columna con nulos, una fila con
+        ese nulo (así aparecen los valores de relleno, p. ej. -1 en 'agent'). Los textos
+        toman su valor más frecuente.
+        """
+        profiles = self._profiles[0]
+
+        def row(bound, null_col=None):
+            values = {}
+            for col, dtype in self.stats['dtypes'].items():
+                numeric, text = profiles.get((col, 'numeric')), profiles.get((col, 'text'))
+                if col == null_col:
+                    values[col] = np.nan
+                elif dtype in ('int64', 'float64') and numeric is not None and numeric.count:
+                    values[col] = numeric.min if bound == 'min' else numeric.max
+                elif dtype == 'object' and text is not None and text.count:
+                    values[col] = text.top(1)[0][0]
+                elif dtype == 'bool':
+                    values[col] = False
+                else:
+                    values[col] = np.nan
+            return values
+
+        nullable = [col for col, dtype in self.stats['dtypes'].items() if dtype != 'int64' and any(
+            summary.nulls for (name, _), summary in profiles.items() if name == col)]
+        rows = [row('min'), row('max')] + [row('min', col) for col in nullable]
+        return pd.DataFrame(rows).astype(self.stats['dtypes'])
+
+    def _compact_dtypes(self) -> dict:
+        """
+        Tipos compactos de las columnas limpias con las mismas reglas que compact_schema
+        (downcast_numeric y categóricos de baja cardinalidad), pero con los resúmenes de
+        todo el archivo. Las columnas derivadas (p. ej. 'total_nights') toman su rango de
+        las filas de _envelope, suponiendo que crecen con las columnas de origen.
+        """
+        profiles, float32_exact = self._profiles
+        inference = SchemaInference()
+        empty = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in self.stats['dtypes'].items()})
+        base = DataCleaner(empty, stats=self.stats, copy=False)
+        base.run(self._clean_steps(), track_memory=False)
+        envelope = DataCleaner(self._envelope(), stats=self.stats, copy=False)
+        envelope.run(self._clean_steps(), track_memory=False)
+        out = envelope.get_dataframe()
+
+        dtypes = {}
+        for col, dtype in base.get_dataframe().dtypes.items():
+            numeric, text = profiles.get((col, 'numeric')), profiles.get((col, 'text'))
+            if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) and col in out:
+                values = out[col].to_numpy(dtype='float64')
+                finite = values[np.isfinite(values)]
+                if not len(finite):
+                    continue
+                integral = pd.api.types.is_integer_dtype(dtype) or (
+                    numeric is not None and numeric.integral and np.array_equal(finite, np.round(finite)))
+                if integral and len(finite) == len(values):
+                    dtypes[col] = pd.to_numeric(pd.Series([finite.min(), finite.max()]).astype('int64'),
+                                                downcast='integer').dtype
+                elif not pd.api.types.is_integer_dtype(dtype) and float32_exact.get(col) and np.array_equal(
+                        values.astype('float32').astype('float64'), values, equal_nan=True):
+                    dtypes[col] = np.dtype('float32')
+            elif (dtype == object or pd.api.types.is_string_dtype(dtype)) and text is not None and text.count:
+                if (not text.truncated and text.cardinality <= inference.max_categories
+                        and text.cardinality / text.count <= inference.category_ratio):
+                    dtypes[col] = pd.CategoricalDtype(sorted(text.counts))
+        return dtypes
+
+    def _clean_steps(self) -> list:
+        # Los duplicados ya se resolvieron con las máscaras de la primera pasada
+        return [name for name in self.steps if name != 'drop_duplicates']
+
+    def output_schema(self) -> pa.Schema:
+        """
+        Esquema Arrow de los bloques limpios, decidido con los tipos de la primera
+        pasada (se limpia un DataFrame vacío con esos tipos) y no con el primer bloque:
+        una columna de texto sin valores en ese bloque sería de tipo null y los
+        bloques siguientes no cabrían. Esas columnas quedan como string.
+        """
+        if self.stats is None:
+            self.compute_stats()
+        empty = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in self.stats['dtypes'].items()})
+        cleaner = DataCleaner(empty, stats=self.stats, copy=False)
+        cleaner.run(self._clean_steps(), track_memory=False)
+        df = cleaner.get_dataframe()
+        if self.compact_dtypes:
+            SchemaInference().conform(df, self.compact_dtypes)
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        fields = [pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field for field in schema]
+        return pa.schema(fields, metadata=schema.metadata)
+
+    def iter_clean_chunks(self, progress=None):
+        # progress(filas_procesadas, filas_totales) se llama tras cada bloque
+        if self.stats is None:
+            self.compute_stats()
+        dedup = 'drop_duplicates' in self.steps
+        steps = self._clean_steps()
+        totals = {name: {'step': name, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0, 'peak_memory_bytes': None}
+                  for name in steps}
+        rows_out = 0
+        rows_done = 0
+        start_total = time.perf_counter()
+
+        chunks = self._read_chunks(dtype=self.stats['dtypes'])
+        for chunk, keep in zip(chunks, self._keep_masks):
+            cleaner = DataCleaner(chunk[keep] if dedup else chunk, stats=self.stats, copy=False)
+            chunk_report = cleaner.run(steps, track_memory=False)
+            for step in chunk_report['steps']:
+                total = totals[step['step']]
+                total['seconds'] += step['seconds']
+                total['rows_in'] += step['rows_in']
+                total['rows_out'] += step['rows_out']
+            rows_out += len(cleaner.df)
+            rows_done += len(chunk)
+            if progress is not None:
+                progress(rows_done, self.stats['rows_in'])
+            if self.compact_dtypes:
+                yield SchemaInference().conform(cleaner.get_dataframe(), self.compact_dtypes)
+            else:
+                yield cleaner.get_dataframe()
+
+        step_reports = list(totals.values())
+        if dedup:
+            step_reports.insert(0, {
+                'step': 'drop_duplicates', 'seconds': self.stats['seconds'], 'rows_in': self.stats['rows_in'],
+                'rows_out': self.stats['rows_in'] - self.stats['duplicates'], 'peak_memory_bytes': None,
+            })
+        self.report = {
+            'pipeline_version': pipeline_version(self.steps),
+            'steps': step_reports,
+            'rows_in': self.stats['rows_in'],
+            'rows_out': rows_out,
+            'total_seconds': time.perf_counter() - start_total,
+        }
+
+    def write_csv(self, output_path: str) -> int:
+        rows = 0
+        for i, chunk in enumerate(self.iter_clean_chunks()):
+            chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            rows += len(chunk)
+        return rows
@@ -0,0 +1,290 @@
+import glob
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from dataset_cache import dataset_cache
+
+ARCHIVOS_GUARDADOS = "archivos_guardados"
+STORE_PATH = os.path.join(ARCHIVOS_GUARDADOS, "limpio_temp.arrow")
+KEY_METADATA = b"dataset_key"
+# Identificador de cada escritura del archivo base (una carga completa nueva cambia aunque la llave se repita)
+BASE_ID_METADATA = b"base_id"
+# Fuente de las páginas de análisis: "arrow" (almacén intermedio) o "postgresql"
+DATA_SOURCE = os.environ.get("DATA_SOURCE", "arrow")
+
+# Llave guardada en cada archivo, por (ruta, mtime, tamaño), para no releer el esquema
+_stored_keys = {}
+
+
+class DataStore:
+    """
+    Almacén intermedio de los datos limpios en formato columnar (Arrow IPC / Feather).
+    Conserva los tipos de cada columna y se lee con memory-map, de modo que cada
+    página carga únicamente las columnas que necesita sin parsear texto. Si el
+    DataFrame ya está en la caché del proceso, no se lee el archivo; la primera
+    lectura de un conjunto que cabe en la caché lo guarda completo, aunque pida
+    solo algunas columnas.
+
+    La llave del conjunto vigente se guarda en los metadatos del archivo, así que
+    todos los procesos (incluidos los de tareas en segundo plano) coinciden en cuál
+    es el dataset actual aunque cada uno tenga su propia caché. Con cache=None no
+    se usa la caché del proceso (p. ej. en callbacks en segundo plano, cuyo proceso
+    termina con la tarea).
+
+    Las cargas incrementales se agregan como partes (<archivo>.parteNNNN) con el
+    mismo esquema que el archivo base; la llave vigente es la de la última parte.
+    base_id() identifica la carga completa a la que pertenecen las partes.
+    """
+    def __init__(self, path: str = STORE_PATH, cache=dataset_cache):
+        self.path = path
+        self.cache = cache
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def part_paths(self) -> list:
+        return sorted(glob.glob(glob.escape(self.path) + ".parte[0-9][0-9][0-9][0-9]"))
+
+    @staticmethod
+    def part_number(path: str) -> int:
+        return int(path[-4:])
+
+    def _files(self) -> list:
+        return [self.path] + self.part_paths()
+
+    def _remove_parts(self):
+        for part in self.part_paths():
+            os.remove(part)
+
+    def _cached(self):
+        if self.cache is None:
+            return None
+        key = self.stored_key()
+        return self.cache.get(key) if key is not None else None
+
+    def _base_metadata(self, schema, key: tuple = None) -> dict:
+        metadata = dict(schema.metadata or {})
+        metadata[BASE_ID_METADATA] = uuid.uuid4().hex.encode("utf-8")
+        if key is not None:
+            metadata[KEY_METADATA] = "|".join(key).encode("utf-8")
+        return metadata
+
+    def save(self, df: pd.DataFrame, key: tuple = None):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        df = df.reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(self._base_metadata(table.schema, key))
+        # Sin compresión para que la lectura con memory-map no copie los buffers
+        tmp_path = self.path + ".tmp"
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        self._remove_parts()
+        os.replace(tmp_path, self.path)
+
+        if key is not None and self.cache is not None:
+            self.cache.put(key, df)
+
+    def save_chunks(self, chunks, key: tuple = None, schema: pa.Schema = None) -> int:
+        # Escritura incremental: solo un bloque en memoria a la vez. Sin schema, el
+        # esquema se toma del primer bloque (una columna sin valores ahí quedaría null)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        writer = None
+        rows = 0
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    if schema is None:
+                        schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    schema = schema.with_metadata(self._base_metadata(schema, key))
+                    writer = pa.ipc.new_file(tmp_path, schema)
+                batch = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                writer.write_table(batch)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError("No se recibieron datos para guardar.")
+        self._remove_parts()
+        os.replace(tmp_path, self.path)
+
+        # El resultado completo no se mete en la caché; se leerá del disco con memory-map
+        return rows
+
+    def append(self, df: pd.DataFrame, key: tuple) -> int:
+        """
+        Agrega un lote ya limpio como una parte nueva, sin reescribir lo existente.
+        El lote se convierte al esquema del archivo base (p. ej. int64 → int8 o texto
+        → categórico); si algún valor no cabe, se rechaza el lote.
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"No hay datos limpios en {self.path} para agregar el lote.")
+        base_schema = self._schema()
+        schema = base_schema.remove_metadata()
+        missing = [name for name in schema.names if name not in df.columns]
+        if missing:
+            raise ValueError(f"Al lote le faltan columnas del almacén: {missing}")
+        table = pa.Table.from_pandas(df[schema.names].reset_index(drop=True), preserve_index=False)
+        try:
+            table = table.cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"El lote no es compatible con los tipos del almacén: {e}")
+        # Mismos metadatos que el archivo base (p. ej. los de pandas) con la llave nueva
+        metadata = dict(base_schema.metadata or {})
+        metadata.pop(BASE_ID_METADATA, None)
+        metadata[KEY_METADATA] = "|".join(key).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+
+        parts = self.part_paths()
+        number = self.part_number(parts[-1]) + 1 if parts else 1
+        part_path = f"{self.path}.parte{number:04d}"
+        feather.write_feather(table, part_path + ".tmp", compression="uncompressed")
+        os.replace(part_path + ".tmp", part_path)
+        return len(df)
+
+    def _schema(self, path: str = None):
+        with pa.memory_map(path or self.path, "r") as source:
+            return pa.ipc.open_file(source).schema
+
+    def stored_key(self):
+        # La llave vigente es la de la última parte agregada (o la del archivo base)
+        path = self._files()[-1]
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if memo_key not in _stored_keys:
+            raw_key = (self._schema(path).metadata or {}).get(KEY_METADATA)
+            _stored_keys[memo_key] = tuple(raw_key.decode("utf-8").split("|")) if raw_key else None
+        return _stored_keys[memo_key]
+
+    def base_id(self):
+        # Cambia con cada carga completa; las partes agregadas después no lo cambian
+        if not self.exists():
+            return None
+        metadata = self._schema().metadata or {}
+        if BASE_ID_METADATA in metadata:
+            return metadata[BASE_ID_METADATA].decode("utf-8")
+        return str(os.stat(self.path).st_mtime_ns)
+
+    def dtypes(self) -> dict:
+        # Tipo de pandas de cada columna, leído solo del esquema (sin datos)
+        if not self.exists():
+            return {}
+        return self._schema().empty_table().to_pandas().dtypes.to_dict()
+
+    def columns(self) -> list:
+        cached = self._cached()
+        if cached is not None:
+            return list(cached.columns)
+        if not os.path.exists(self.path):
+            return []
+        return self._schema().names
+
+    def head(self, n: int = 100) -> pd.DataFrame:
+        cached = self._cached()
+        if cached is not None:
+            return cached.head(n)
+        with pa.memory_map(self.path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            if reader.num_record_batches == 0:
+                return reader.schema.empty_table().to_pandas()
+            return reader.get_batch(0).slice(0, n).to_pandas()
+
+    def _iter_batches(self, columns=None, paths=None):
+        for path in paths or self._files():
+            with pa.memory_map(path, "r") as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    yield batch.select(columns) if columns is not None else batch
+
+    def num_rows(self, paths=None) -> int:
+        # Filas del archivo y sus partes, leídas de los lotes con memory-map (sin copiar datos)
+        return sum(batch.num_rows for batch in self._iter_batches(columns=[], paths=paths))
+
+    def _categories(self, paths: list, columns=None) -> dict:
+        # Categorías de cada columna de diccionario: unión de los diccionarios de todos los
+        # archivos (el archivo IPC guarda uno por columna, compartido por todos sus lotes)
+        found = {}
+        for path in paths:
+            with pa.memory_map(path, "r") as source:
+                reader = pa.ipc.open_file(source)
+                if reader.num_record_batches == 0:
+                    continue
+                batch = reader.get_batch(0)
+                for field, column in zip(batch.schema, batch.columns):
+                    if pa.types.is_dictionary(field.type) and (columns is None or field.name in columns):
+                        found.setdefault(field.name, []).append(column.dictionary.to_pandas())
+        return {name: pd.Index(pd.concat(values, ignore_index=True).unique()) for name, values in found.items()}
+
+    def iter_chunks(self, columns=None, chunksize: int = 100_000, paths: list = None):
+        """
+        Recorre el archivo y sus partes (o solo las partes indicadas en paths) por
+        lotes de tamaño fijo sin cargarlos completos. Los categóricos tienen las
+        mismas categorías en todos los lotes, p. ej. para crear un ENUM con el primero.
+        """
+        paths = paths or self._files()
+        if columns is not None:
+            available = set(self._schema().names)
+            columns = [col for col in columns if col in available]
+        categories = self._categories(paths, columns)
+
+        def to_pandas(table):
+            df = table.to_pandas()
+            for col, values in categories.items():
+                df[col] = df[col].cat.set_categories(values)
+            return df
+
+        pending, rows = [], 0
+        for batch in self._iter_batches(columns, paths):
+            pending.append(batch)
+            rows += batch.num_rows
+            while rows >= chunksize:
+                table = pa.Table.from_batches(pending)
+                yield to_pandas(table.slice(0, chunksize))
+                rest = table.slice(chunksize)
+                pending, rows = rest.to_batches(), rest.num_rows
+        if rows:
+            yield to_pandas(pa.Table.from_batches(pending))
+
+    def load(self, columns=None) -> pd.DataFrame:
+        cached = self._cached()
+        if cached is not None:
+            if columns is None:
+                return cached.copy(deep=False)
+            return cached[[col for col in columns if col in cached.columns]]
+
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No hay datos limpios en {self.path}.")
+        if columns is not None:
+            available = set(self._schema().names)
+            columns = [col for col in columns if col in available]
+        # Con memory-map leer todas las columnas no copia datos; solo se convierte lo necesario
+        tables = [feather.read_table(path, memory_map=True) for path in self._files()]
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+
+        # Si el conjunto completo cabe en la caché se convierte completo aunque se pidan
+        # columnas: las lecturas siguientes (de cualquier subconjunto) no tocan el disco
+        key = self.stored_key() if self.cache is not None else None
+        if key is not None and table.nbytes <= self.cache.max_bytes:
+            df = table.to_pandas()
+            self.cache.put(key, df)
+            return df.copy(deep=False) if columns is None else df[columns]
+        return (table if columns is None else table.select(columns)).to_pandas()
+
+
+def open_store(cache=dataset_cache):
+    """
+    Almacén del que leen las páginas de análisis. Con DATA_SOURCE=postgresql se lee
+    la tabla de PostgreSQL (PostgresStore, con la misma interfaz) en lugar del
+    archivo Arrow; sus filtros se toman de PG_READ_FILTERS. cache=None para los
+    callbacks en segundo plano (ver DataStore).
+    """
+    if DATA_SOURCE == "postgresql":
+        from pg_store import PostgresStore
+        return PostgresStore.from_env()
+    return DataStore(cache=cache)
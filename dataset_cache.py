@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+RAW_CACHE_DIR = os.path.join("archivos_guardados", "cache_original")
+RAW_CACHE_FILES = 2
+
+
+_fingerprints = {}
+
+
+def file_fingerprint(path: str, chunk_size: int = 1024 * 1024) -> str:
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _fingerprints:
+        return _fingerprints[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    _fingerprints[memo_key] = digest.hexdigest()
+    return _fingerprints[memo_key]
+
+
+class DatasetCache:
+    """
+    Caché en memoria del proceso para DataFrames, con presupuesto de memoria y
+    desalojo LRU. Las llaves son tuplas (huella del archivo subido, etapa), donde
+    la etapa es "raw" o la versión del pipeline de limpieza.
+
+    Solo sirve dentro del proceso web: lo que guarda un callback en segundo plano
+    (otro proceso) se pierde al terminar. Para compartir entre procesos está
+    RawFrameCache (en disco).
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, df: pd.DataFrame):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._entries.pop(key, None)
+            self._sizes.pop(key, None)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = df
+            self._sizes[key] = size
+            while self.total_bytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self._sizes.pop(old_key)
+
+    def start_dataset(self, fingerprint: str):
+        # Un archivo nuevo invalida todo lo calculado para los anteriores
+        with self._lock:
+            for key in [k for k in self._entries if k[0] != fingerprint]:
+                self._entries.pop(key)
+                self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+
+class RawFrameCache:
+    """
+    Caché en disco de los CSV originales ya parseados, uno por huella del archivo,
+    en Arrow IPC sin compresión (se lee con memory-map sin volver a parsear texto).
+    La comparten el proceso web y los callbacks en segundo plano. Se conservan los
+    max_files archivos usados más recientemente.
+    """
+    def __init__(self, root: str = RAW_CACHE_DIR, max_files: int = RAW_CACHE_FILES):
+        self.root = root
+        self.max_files = max_files
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.root, f"{fingerprint}.arrow")
+
+    def get(self, fingerprint: str):
+        path = self._path(fingerprint)
+        try:
+            table = feather.read_table(path, memory_map=True)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        os.utime(path)
+        return table.to_pandas()
+
+    def put(self, fingerprint: str, df: pd.DataFrame):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Columnas con tipos mezclados: no se guardan y se vuelve a leer el CSV
+            return
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(fingerprint)
+        feather.write_feather(table, path + ".tmp", compression="uncompressed")
+        os.replace(path + ".tmp", path)
+        files = sorted((entry.path for entry in os.scandir(self.root) if entry.name.endswith(".arrow")),
+                       key=os.path.getmtime, reverse=True)
+        for old_path in files[self.max_files:]:
+            os.remove(old_path)
+
+
+dataset_cache = DatasetCache()
+raw_frame_cache = RawFrameCache()
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import pool as pg_pool
+from flask import jsonify
+
+# Conexión configurable por entorno: PG_DSN completo o cada parámetro por separado
+DEFAULT_PARAMS = {
+    'host': 'localhost',
+    'port': '5432',
+    'dbname': 'hotel_pob',
+    'user': 'postgres',
+    'password': 'root',
+}
+ENV_PARAMS = {
+    'host': 'PG_HOST',
+    'port': 'PG_PORT',
+    'dbname': 'PG_DATABASE',
+    'user': 'PG_USER',
+    'password': 'PG_PASSWORD',
+}
+# Una conexión ociosa más tiempo que esto se verifica con SELECT 1 antes de entregarse
+HEALTH_CHECK_SECONDS = 30
+# Espera máxima por una conexión libre cuando las max_size están prestadas
+POOL_TIMEOUT_SECONDS = float(os.environ.get("PG_POOL_TIMEOUT", 30))
+
+# Pools heredados del proceso padre tras un fork: se conservan sin cerrarlos. Si se
+# liberaran, psycopg2 cerraría sus conexiones (PQfinish) y con ellas los sockets que
+# el proceso padre sigue usando.
+_inherited_pools = []
+
+
+def dsn_from_env() -> str:
+    if os.environ.get("PG_DSN"):
+        return os.environ["PG_DSN"]
+    params = {name: os.environ.get(env, DEFAULT_PARAMS[name]) for name, env in ENV_PARAMS.items()}
+    return " ".join(f"{name}='{value}'" for name, value in params.items())
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones a PostgreSQL compartido por las páginas, los callbacks en
+    segundo plano y los scripts, para no pagar conexión y autenticación en cada
+    exportación o lectura. El pool se crea al primer uso y de nuevo si cambia el
+    proceso (las conexiones no se comparten entre procesos).
+
+    Antes de entregar una conexión que estuvo ociosa más de HEALTH_CHECK_SECONDS
+    se verifica con SELECT 1; si falló o se cerró, se descarta y se abre otra.
+    Con las max_size conexiones prestadas, getconn espera a que se devuelva una
+    (hasta POOL_TIMEOUT_SECONDS; después lanza PoolError). metrics() reporta cuántas
+    conexiones se abrieron, cuántas veces se reutilizaron y el tiempo de espera.
+    """
+    def __init__(self, dsn: str = None, min_size: int = None, max_size: int = None):
+        self.dsn = dsn
+        self.min_size = min_size if min_size is not None else int(os.environ.get("PG_POOL_MIN", 1))
+        self.max_size = max_size if max_size is not None else int(os.environ.get("PG_POOL_MAX", 5))
+        self._pool = None
+        self._after_fork()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # En el proceso hijo: el pool del padre se conserva aparte y se abre uno propio al primer uso
+        if self._pool is not None:
+            _inherited_pools.append(self._pool)
+        self._pool = None
+        self._pid = os.getpid()
+        self._last_used = {}
+        # Los candados pudieron quedar tomados por otro hilo del padre al momento del fork
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self.stats = {'opened': 0, 'checkouts': 0, 'reused': 0, 'health_checks': 0,
+                      'discarded': 0, 'wait_seconds': 0.0, 'timeouts': 0}
+
+    def _count(self, name: str, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _get_pool(self):
+        if self._pid != os.getpid():
+            # Fork sin register_at_fork (o antes de registrarlo)
+            self._after_fork()
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(
+                        self.min_size, self.max_size, self.dsn or dsn_from_env())
+        return self._pool
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < HEALTH_CHECK_SECONDS:
+            return True
+        self._count('health_checks')
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        pool = self._get_pool()
+        # ThreadedConnectionPool falla de inmediato si no hay conexiones libres; el semáforo
+        # (uno por conexión posible) hace que se espere a que otra se devuelva
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=POOL_TIMEOUT_SECONDS):
+            self._count('timeouts')
+            raise pg_pool.PoolError(
+                f"No hubo una conexión libre en {POOL_TIMEOUT_SECONDS:.0f} s (máximo {self.max_size}).")
+        self._count('wait_seconds', time.perf_counter() - start)
+        try:
+            conn = pool.getconn()
+            while not self._healthy(conn):
+                self._count('discarded')
+                self._last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        self._count('checkouts')
+        self._count('reused' if id(conn) in self._last_used else 'opened')
+        return conn
+
+    def putconn(self, conn, broken: bool = False):
+        try:
+            if broken or conn.closed:
+                self._last_used.pop(id(conn), None)
+                self._get_pool().putconn(conn, close=True)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Conexión prestada del pool. Al salir se devuelve; si hubo un error se hace
+        rollback (y se cierra si la conexión quedó inservible).
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+
+    def health(self) -> bool:
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1;")
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        checkouts = stats['checkouts']
+        return dict(stats,
+                    reuse_ratio=stats['reused'] / checkouts if checkouts else None,
+                    min_size=self.min_size, max_size=self.max_size)
+
+    def close(self):
+        with self._lock:
+            # Solo el pool propio: los heredados de otro proceso nunca se cierran aquí
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+
+
+db_pool = ConnectionPool()
+
+
+def register_db_routes(server, connection_pool: ConnectionPool = None):
+    # GET /db/metrics: salud de la base y reutilización de conexiones del proceso web
+    connection_pool = connection_pool or db_pool
+
+    @server.route("/db/metrics", methods=["GET"])
+    def db_metrics():
+        return jsonify(dict(connection_pool.metrics(), healthy=connection_pool.health()))
+
+    return connection_pool
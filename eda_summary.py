@@ -0,0 +1,494 @@
+import hashlib
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from data_store import ARCHIVOS_GUARDADOS
+
+EDA_DIR = os.path.join(ARCHIVOS_GUARDADOS, "eda")
+SUMMARY_VERSION = "3"
+MAX_BINS = 1024
+EXTREMES = 50
+MAX_CATEGORIES = 10_000
+# Columnas numéricas que son identificadores y no entran a la correlación
+ID_LIKE_COLUMNS = ["agent", "company"]
+
+
+def _width_for(low: float, high: float) -> float:
+    # Ancho de bin potencia de dos: los histogramas de distintos bloques se alinean al combinarse
+    span = high - low
+    if span <= 0:
+        return 1.0
+    return 2.0 ** math.ceil(math.log2(span / MAX_BINS))
+
+
+class NumericSummary:
+    """
+    Resumen combinable de una columna numérica: conteo, nulos, media y varianza
+    (fórmula de Chan), mínimo, máximo, un histograma fino de bins alineados y los
+    valores más extremos de cada lado. Se actualiza bloque a bloque con update() o
+    juntando resúmenes con merge(), y con él se dibujan histograma y boxplot sin
+    volver a leer los datos.
+    """
+    kind = "numeric"
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.integral = True
+        self.width = 1.0
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.low = np.zeros(0)
+        self.high = np.zeros(0)
+
+    @classmethod
+    def from_values(cls, values) -> "NumericSummary":
+        summary = cls()
+        summary.update(values)
+        return summary
+
+    def update(self, values):
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64')
+        missing = np.isnan(values)
+        values = values[~missing]
+        chunk = NumericSummary()
+        chunk.nulls = int(missing.sum())
+        if len(values):
+            chunk.count = len(values)
+            chunk.mean = float(values.mean())
+            chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+            chunk.min, chunk.max = float(values.min()), float(values.max())
+            chunk.integral = bool(np.all(values == np.floor(values)))
+            chunk.width = _width_for(chunk.min, chunk.max)
+            bins = np.floor(values / chunk.width).astype(np.int64)
+            chunk.offset = int(bins.min())
+            chunk.counts = np.bincount(bins - chunk.offset)
+            k = min(EXTREMES, len(values))
+            chunk.low = np.sort(np.partition(values, k - 1)[:k])
+            chunk.high = np.sort(np.partition(values, len(values) - k)[len(values) - k:])
+        self.merge(chunk)
+        return self
+
+    def _rebin(self, width: float):
+        if width == self.width or not len(self.counts):
+            self.width = max(self.width, width)
+            return
+        factor = int(round(width / self.width))
+        bins = (self.offset + np.arange(len(self.counts))) // factor
+        self.offset = int(bins[0])
+        self.counts = np.bincount(bins - self.offset, weights=self.counts).astype(np.int64)
+        self.width = width
+
+    def merge(self, other: "NumericSummary") -> "NumericSummary":
+        self.nulls += other.nulls
+        if not other.count:
+            return self
+        if not self.count:
+            for attr in ('count', 'mean', 'm2', 'min', 'max', 'integral', 'width', 'offset'):
+                setattr(self, attr, getattr(other, attr))
+            self.counts, self.low, self.high = other.counts.copy(), other.low.copy(), other.high.copy()
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.integral = self.integral and other.integral
+
+        # Histogramas al ancho mayor; si el rango creció demasiado se duplica el ancho
+        other = other.copy()
+        width = max(self.width, other.width)
+        self._rebin(width)
+        other._rebin(width)
+        start = min(self.offset, other.offset)
+        end = max(self.offset + len(self.counts), other.offset + len(other.counts))
+        counts = np.zeros(end - start, dtype=np.int64)
+        counts[self.offset - start:self.offset - start + len(self.counts)] += self.counts
+        counts[other.offset - start:other.offset - start + len(other.counts)] += other.counts
+        self.offset, self.counts = start, counts
+        while len(self.counts) > MAX_BINS:
+            self._rebin(self.width * 2)
+
+        self.low = np.sort(np.concatenate([self.low, other.low]))[:EXTREMES]
+        self.high = np.sort(np.concatenate([self.high, other.high]))[-EXTREMES:]
+        return self
+
+    def copy(self) -> "NumericSummary":
+        return type(self).from_dict(self.to_dict())
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan')
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return float('nan')
+        cumulative = np.cumsum(self.counts)
+        target = q * self.count
+        i = int(np.searchsorted(cumulative, target, side='left'))
+        i = min(i, len(self.counts) - 1)
+        edge = (self.offset + i) * self.width
+        if self.integral and self.width <= 1:
+            # Cada bin contiene un solo entero: el borde es el valor exacto
+            value = edge
+        else:
+            before = cumulative[i - 1] if i > 0 else 0
+            fraction = (target - before) / self.counts[i] if self.counts[i] else 0.0
+            value = edge + fraction * self.width
+        return float(min(max(value, self.min), self.max))
+
+    def histogram(self, nbins: int = 30):
+        # Reagrupa el histograma fino en nbins bins entre el mínimo y el máximo
+        edges = np.linspace(self.min, self.max, nbins + 1) if self.max > self.min \
+            else np.array([self.min - 0.5, self.min + 0.5])
+        positions = (self.offset + np.arange(len(self.counts))) * self.width
+        if not (self.integral and self.width <= 1):
+            positions = positions + self.width / 2
+        counts, _ = np.histogram(np.clip(positions, edges[0], edges[-1]), bins=edges, weights=self.counts)
+        return counts.astype(np.int64), edges
+
+    def box(self) -> dict:
+        q1, median, q3 = self.quantile(0.25), self.quantile(0.5), self.quantile(0.75)
+        iqr = q3 - q1
+        low_bound, high_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        outliers = np.concatenate([self.low[self.low < low_bound], self.high[self.high > high_bound]])
+        # Bigotes: el valor más extremo dentro de los límites (aproximado al bin)
+        inside_low = self.low[self.low >= low_bound]
+        inside_high = self.high[self.high <= high_bound]
+        lower = float(inside_low[0]) if len(inside_low) else max(low_bound, self.min)
+        upper = float(inside_high[-1]) if len(inside_high) else min(high_bound, self.max)
+        return {'q1': q1, 'median': median, 'q3': q3, 'lowerfence': lower, 'upperfence': upper,
+                'mean': self.mean, 'sd': self.std, 'outliers': np.unique(outliers).tolist()}
+
+    def to_dict(self) -> dict:
+        return {
+            'kind': self.kind, 'count': self.count, 'nulls': self.nulls, 'mean': self.mean, 'm2': self.m2,
+            'min': self.min, 'max': self.max, 'integral': self.integral, 'width': self.width,
+            'offset': self.offset, 'counts': self.counts.tolist(),
+            'low': self.low.tolist(), 'high': self.high.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NumericSummary":
+        summary = cls()
+        for attr in ('count', 'nulls', 'mean', 'm2', 'min', 'max', 'integral', 'width', 'offset'):
+            setattr(summary, attr, data[attr])
+        summary.counts = np.asarray(data['counts'], dtype=np.int64)
+        summary.low = np.asarray(data['low'], dtype='float64')
+        summary.high = np.asarray(data['high'], dtype='float64')
+        return summary
+
+
+class DatetimeSummary(NumericSummary):
+    """
+    Resumen combinable de una columna de fechas: el mismo que el numérico sobre los
+    segundos desde epoch (conteo, nulos, mínimo, máximo e histograma), para mostrar
+    un rango en lugar de cada fecha como categoría. first/last dan los extremos
+    como fechas.
+    """
+    kind = "datetime"
+
+    def update(self, values):
+        dates = pd.to_datetime(pd.Series(values), errors='coerce')
+        if getattr(dates.dt, 'tz', None) is not None:
+            dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+        seconds = (dates - pd.Timestamp(0)) / pd.Timedelta(seconds=1)
+        return super().update(seconds)
+
+    @property
+    def first(self):
+        return pd.Timestamp(self.min, unit='s') if self.count else pd.NaT
+
+    @property
+    def last(self):
+        return pd.Timestamp(self.max, unit='s') if self.count else pd.NaT
+
+
+class CategoricalSummary:
+    """
+    Resumen combinable de una columna categórica o de texto: conteo, nulos y
+    frecuencia de cada categoría. Si hay más de MAX_CATEGORIES valores distintos se
+    dejan de registrar categorías nuevas y la cardinalidad queda como cota inferior.
+    """
+    kind = "categorical"
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.counts = {}
+        self.truncated = False
+
+    def update(self, values):
+        values = pd.Series(values)
+        missing = values.isna()
+        self.nulls += int(missing.sum())
+        chunk = values[~missing].astype(str).value_counts()
+        self.count += int(chunk.sum())
+        self._add(chunk.items())
+        return self
+
+    def _add(self, items):
+        for value, n in items:
+            if value in self.counts:
+                self.counts[value] += int(n)
+            elif len(self.counts) < MAX_CATEGORIES:
+                self.counts[value] = int(n)
+            else:
+                self.truncated = True
+
+    def merge(self, other: "CategoricalSummary") -> "CategoricalSummary":
+        self.count += other.count
+        self.nulls += other.nulls
+        self.truncated = self.truncated or other.truncated
+        self._add(other.counts.items())
+        return self
+
+    @property
+    def cardinality(self) -> int:
+        return len(self.counts)
+
+    def top(self, k: int = 5) -> list:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def to_dict(self) -> dict:
+        return {'kind': self.kind, 'count': self.count, 'nulls': self.nulls,
+                'counts': self.counts, 'truncated': self.truncated}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CategoricalSummary":
+        summary = cls()
+        summary.count, summary.nulls = data['count'], data['nulls']
+        summary.counts, summary.truncated = dict(data['counts']), data['truncated']
+        return summary
+
+
+SUMMARY_KINDS = {cls.kind: cls for cls in (NumericSummary, DatetimeSummary, CategoricalSummary)}
+
+
+def summary_from_dict(data: dict):
+    return SUMMARY_KINDS[data.get('kind', "numeric")].from_dict(data)
+
+
+def new_summary(series: pd.Series):
+    # Numérica para columnas numéricas (sin booleanos), de fechas para datetime; categórica para el resto
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return NumericSummary()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DatetimeSummary()
+    return CategoricalSummary()
+
+
+def summarize_chunks(chunks, columns: list = None) -> dict:
+    # Un resumen por columna, actualizado con cada bloque; el tipo se decide con el primero
+    summaries = {}
+    for chunk in chunks:
+        for col in (columns if columns is not None else chunk.columns):
+            if col not in chunk.columns:
+                continue
+            if col not in summaries:
+                summaries[col] = new_summary(chunk[col])
+            summaries[col].update(chunk[col])
+    return summaries
+
+
+class CorrelationStats:
+    """
+    Estadísticos suficientes para la correlación de Pearson por pares: para cada par
+    de columnas, el número de filas con ambos valores, sus sumas, sumas de cuadrados
+    y productos cruzados (sobre valores desplazados para no perder precisión). Se
+    acumulan bloque a bloque, se combinan entre particiones con merge() y se
+    restringen a un subconjunto de columnas sin volver a leer los datos.
+    """
+    def __init__(self, columns: list = None):
+        self.columns = list(columns) if columns is not None else None
+        self.shift = None
+        self.n = self.sx = self.sxx = self.sxy = None
+
+    def _init(self, shift: np.ndarray):
+        size = len(self.columns)
+        self.shift = shift
+        self.n, self.sx, self.sxx, self.sxy = (np.zeros((size, size)) for _ in range(4))
+
+    def update(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self.columns = correlation_columns(chunk)
+        X = chunk[self.columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+        present = ~np.isnan(X)
+        if self.shift is None:
+            # El desplazamiento es la media del primer bloque (0 si la columna viene vacía)
+            totals = np.where(present, X, 0.0).sum(axis=0)
+            self._init(np.divide(totals, present.sum(axis=0), out=np.zeros(len(self.columns)),
+                                 where=present.any(axis=0)))
+        mask = present.astype('float64')
+        Z = np.where(present, X - self.shift, 0.0)
+        self.n += mask.T @ mask
+        self.sx += Z.T @ mask
+        self.sxx += (Z * Z).T @ mask
+        self.sxy += Z.T @ Z
+        return self
+
+    def _reshift(self, shift: np.ndarray):
+        # Cambia el desplazamiento sin tocar los datos: x - c' = (x - c) - d
+        d = (shift - self.shift)[:, None]
+        d_t = d.T
+        self.sxy = self.sxy - d_t * self.sx - d * self.sx.T + d * d_t * self.n
+        self.sxx = self.sxx - 2 * d * self.sx + d ** 2 * self.n
+        self.sx = self.sx - d * self.n
+        self.shift = shift
+
+    def merge(self, other: "CorrelationStats") -> "CorrelationStats":
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.columns = list(other.columns)
+            self._init(other.shift.copy())
+        elif self.columns != other.columns:
+            raise ValueError("Solo se pueden combinar estadísticos con las mismas columnas.")
+        other = other.restrict(other.columns)
+        other._reshift(self.shift)
+        self.n += other.n
+        self.sx += other.sx
+        self.sxx += other.sxx
+        self.sxy += other.sxy
+        return self
+
+    def restrict(self, columns: list) -> "CorrelationStats":
+        index = [self.columns.index(col) for col in columns if col in self.columns]
+        subset = CorrelationStats([self.columns[i] for i in index])
+        if self.shift is not None:
+            grid = np.ix_(index, index)
+            subset.shift = self.shift[index].copy()
+            subset.n, subset.sx, subset.sxx, subset.sxy = (
+                matrix[grid].copy() for matrix in (self.n, self.sx, self.sxx, self.sxy))
+        return subset
+
+    def matrix(self) -> pd.DataFrame:
+        if self.shift is None:
+            return pd.DataFrame(index=self.columns, columns=self.columns, dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = self.n * self.sxy - self.sx * self.sx.T
+            variance = self.n * self.sxx - self.sx ** 2
+            corr = covariance / np.sqrt(variance * variance.T)
+        corr[(self.n < 2) | (variance <= 0) | (variance.T <= 0)] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+    def to_dict(self) -> dict:
+        data = {'columns': self.columns, 'shift': None}
+        if self.shift is not None:
+            data.update({'shift': self.shift.tolist(), 'n': self.n.tolist(), 'sx': self.sx.tolist(),
+                         'sxx': self.sxx.tolist(), 'sxy': self.sxy.tolist()})
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CorrelationStats":
+        stats = cls(data['columns'])
+        if data['shift'] is not None:
+            stats.shift = np.asarray(data['shift'])
+            stats.n, stats.sx, stats.sxx, stats.sxy = (
+                np.asarray(data[name], dtype='float64') for name in ('n', 'sx', 'sxx', 'sxy'))
+        return stats
+
+
+def correlation_columns(df: pd.DataFrame) -> list:
+    # Numéricas, sin booleanos ni identificadores (agent, company) que no son magnitudes
+    return [col for col in df.columns
+            if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+            and col not in ID_LIKE_COLUMNS]
+
+
+def _cache_path(dataset_key, columns: list, kind: str = "resumen") -> str:
+    payload = json.dumps({'dataset': list(dataset_key), 'columns': columns, 'version': SUMMARY_VERSION})
+    return os.path.join(EDA_DIR, f"{kind}_{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def _read_cache(path: str):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def _write_cache(path: str, data):
+    os.makedirs(EDA_DIR, exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def summarize_store(store, columns: list = None, chunksize: int = 100_000) -> dict:
+    """
+    Resúmenes de las columnas del almacén (todas si columns es None), calculados una
+    sola vez por versión del dataset (la llave guardada en el archivo) y guardados
+    como JSON.
+    """
+    stored_columns = store.columns()
+    columns = stored_columns if columns is None else [col for col in columns if col in stored_columns]
+    dataset_key = store.stored_key()
+    path = _cache_path(dataset_key, columns) if dataset_key else None
+    cached = _read_cache(path)
+    if cached is not None:
+        return {col: summary_from_dict(data) for col, data in cached.items()}
+
+    summaries = summarize_chunks(store.iter_chunks(columns=columns, chunksize=chunksize), columns)
+    if path:
+        _write_cache(path, {col: summary.to_dict() for col, summary in summaries.items()})
+    return summaries
+
+
+def save_correlation(dataset_key, stats: CorrelationStats):
+    # La limpieza guarda aquí los estadísticos que acumuló al escribir el almacén
+    _write_cache(_cache_path(dataset_key, None, kind="correlacion"), stats.to_dict())
+
+
+def correlation_store(store, columns: list = None, chunksize: int = 100_000) -> pd.DataFrame:
+    """
+    Matriz de correlación del almacén a partir de los estadísticos guardados para su
+    versión; si no existen se calculan en una pasada por bloques y se guardan.
+    columns restringe la matriz a esas columnas.
+    """
+    dataset_key = store.stored_key()
+    path = _cache_path(dataset_key, None, kind="correlacion") if dataset_key else None
+    cached = _read_cache(path)
+    if cached is not None:
+        stats = CorrelationStats.from_dict(cached)
+    else:
+        stats = CorrelationStats()
+        for chunk in store.iter_chunks(chunksize=chunksize):
+            stats.update(chunk)
+        if path:
+            _write_cache(path, stats.to_dict())
+    if columns is not None:
+        stats = stats.restrict(columns)
+    return stats.matrix()
+
+
+def extend_cached(old_key, new_key, delta: pd.DataFrame, columns: list):
+    """
+    Tras agregar un lote al almacén, combina los resúmenes y la correlación ya
+    guardados para la versión anterior con los del lote y los guarda para la nueva;
+    así no hay que recorrer de nuevo todo el historial. columns son las columnas del
+    almacén (las que usa summarize_store por defecto).
+    """
+    if old_key is None:
+        return
+    cached = _read_cache(_cache_path(old_key, columns))
+    if cached is not None:
+        summaries = {col: summary_from_dict(data) for col, data in cached.items()}
+        for col, summary in summaries.items():
+            if col in delta.columns:
+                summary.update(delta[col])
+        _write_cache(_cache_path(new_key, columns), {col: summary.to_dict() for col, summary in summaries.items()})
+
+    cached = _read_cache(_cache_path(old_key, None, kind="correlacion"))
+    if cached is not None:
+        stats = CorrelationStats.from_dict(cached)
+        stats.merge(CorrelationStats(stats.columns).update(delta))
+        save_correlation(new_key, stats)
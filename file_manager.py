@@ -1,68 +1,322 @@
 import pandas as pd
 import os
 import psycopg2
-import io
-from sqlalchemy import create_engine
+from db_pool import db_pool
+import uuid
+from pg_copy import copy_dataframe
+
+PARTITION_COLUMNS = ['arrival_date_year', 'arrival_date_month']
+# Llave del upsert (columnas separadas por comas) y particionado, configurables por entorno
+UPSERT_KEY = [col.strip() for col in os.environ.get("PG_UPSERT_KEY", "").split(",") if col.strip()]
+PARTITIONED = os.environ.get("PG_PARTITIONED", "") == "1"
+# COPY en formato binario (sin parseo de texto en el servidor)
+BINARY_COPY = os.environ.get("PG_BINARY_COPY", "") == "1"
+# Tabla de control: versión de cada tabla cargada (aumentada en cada escritura) y la
+# marca de exportación: carga completa del almacén (base) y última parte ya enviada
+CONTROL_TABLE = "etl_control"
+# Filas de datos que caben en una hoja de Excel (1,048,576 menos el encabezado)
+EXCEL_MAX_ROWS = 1_048_575
+
 
 class FileManager:
-    def __init__(self):
-        self.params = {
-            'host': 'localhost',
-            'port': '5432',
-            'database': 'hotel_pob',
-            'user': 'postgres',
-            'password': 'root'
-        }
+    """
+    Guardado y lectura de archivos y de la tabla de PostgreSQL.
+
+    Modos de carga a PostgreSQL:
+    - save_chunks_to_postgresql_copy: recarga completa. Los datos se copian a una
+      tabla nueva y al final se intercambia por la vigente en una sola transacción,
+      así los lectores nunca ven la tabla vacía ni a medio cargar.
+    - merge_chunks_to_postgresql: los bloques se copian a una tabla temporal y se
+      insertan en la vigente; con upsert_key se usa INSERT ... ON CONFLICT sobre
+      esas columnas (las filas existentes se actualizan en lugar de duplicarse).
+
+    Con partitioned=True la tabla se particiona por rango de arrival_date_year y,
+    dentro de cada año, por lista de arrival_date_month. Los valores sin partición
+    propia caen en particiones DEFAULT.
+
+    Los bloques se envían con COPY en flujo (pg_copy); con binary_copy=True en el
+    formato binario de PostgreSQL.
+
+    Ambos modos aumentan la versión de la tabla en CONTROL_TABLE dentro de la misma
+    transacción que escribe los datos (PostgresStore.stored_key la usa como llave).
+    Con mark=(base, parte) guardan también hasta qué parte del almacén Arrow se
+    exportó, para que una exportación incremental envíe solo las partes siguientes.
+    """
+    def __init__(self, upsert_key: list = None, partitioned: bool = None, binary_copy: bool = None):
+        # Las conexiones salen del pool compartido (DSN por entorno, ver db_pool)
+        self.pool = db_pool
         self.table_name = 'datos_limpios'
+        self.upsert_key = list(upsert_key or UPSERT_KEY) or None
+        self.partitioned = PARTITIONED if partitioned is None else partitioned
+        self.binary_copy = BINARY_COPY if binary_copy is None else binary_copy
+
+    def _enum_type_name(self, table_name, col):
+        return f"{table_name}_{col}_enum"
+
+    def _is_partitioned(self, df):
+        return self.partitioned and all(col in df.columns for col in PARTITION_COLUMNS)
 
     def create_table_from_df(self, cursor, table_name, df):
         mapping = {
             'object': 'TEXT',
+            'int8': 'SMALLINT',
+            'int16': 'SMALLINT',
+            'int32': 'INTEGER',
             'int64': 'BIGINT',
+            'float32': 'REAL',
             'float64': 'DOUBLE PRECISION',
             'bool': 'BOOLEAN',
+            'boolean': 'BOOLEAN',
             'datetime64[ns]': 'TIMESTAMP'
         }
         columns_def = []
         for col in df.columns:
-            dtype_str = str(df[col].dtype)
-            pg_type = mapping.get(dtype_str, 'TEXT')
+            dtype = df[col].dtype
+            dtype_str = str(dtype)
+            if isinstance(dtype, pd.CategoricalDtype):
+                categories = dtype.categories
+                if pd.api.types.is_numeric_dtype(categories.dtype):
+                    # Categóricos numéricos: se guarda el valor con el tipo de sus categorías
+                    pg_type = mapping.get(str(categories.dtype), 'TEXT')
+                else:
+                    # Categóricos de texto: tipo ENUM de PostgreSQL (4 bytes por valor)
+                    pg_type = f'"{self._enum_type_name(table_name, col)}"'
+                    labels = ", ".join("'" + str(c).replace("'", "''") + "'" for c in categories)
+                    cursor.execute(f'DROP TYPE IF EXISTS {pg_type} CASCADE;')
+                    cursor.execute(f'CREATE TYPE {pg_type} AS ENUM ({labels});')
+            elif dtype_str.startswith('datetime64'):
+                pg_type = 'TIMESTAMP'
+            else:
+                pg_type = mapping.get(dtype_str, 'TEXT')
             columns_def.append(f'"{col}" {pg_type}')
         columns_sql = ", ".join(columns_def)
-        ddl = f'CREATE TABLE IF NOT EXISTS "{table_name}" ({columns_sql});'
-        cursor.execute(ddl)
+        ddl = f'CREATE TABLE IF NOT EXISTS "{table_name}" ({columns_sql})'
+        if self._is_partitioned(df):
+            ddl += f' PARTITION BY RANGE ("{PARTITION_COLUMNS[0]}")'
+            cursor.execute(ddl + ';')
+            cursor.execute(f'CREATE TABLE "{table_name}_default" PARTITION OF "{table_name}" DEFAULT;')
+        else:
+            cursor.execute(ddl + ';')
+
+    def _create_partitions(self, cursor, table_name, df, created: set):
+        # Una partición por año (subparticionada por mes) para los valores del bloque que aún no la tienen
+        year_col, month_col = PARTITION_COLUMNS
+        pairs = df[[year_col, month_col]].dropna().drop_duplicates()
+        for year, month in pairs.itertuples(index=False):
+            year = int(year)
+            year_table = f"{table_name}_{year}"
+            if year not in created:
+                cursor.execute(
+                    f'CREATE TABLE "{year_table}" PARTITION OF "{table_name}" '
+                    f'FOR VALUES FROM ({year}) TO ({year + 1}) PARTITION BY LIST ("{month_col}");')
+                cursor.execute(f'CREATE TABLE "{year_table}_default" PARTITION OF "{year_table}" DEFAULT;')
+                created.add(year)
+            if (year, str(month)) not in created:
+                suffix = "".join(ch for ch in str(month).lower() if ch.isalnum())
+                cursor.execute(
+                    f'CREATE TABLE "{year_table}_{suffix}" PARTITION OF "{year_table}" FOR VALUES IN (%s);',
+                    (str(month),))
+                created.add((year, str(month)))
+
+    def connection(self):
+        return self.pool.connection()
+
+    def _copy_df(self, cursor, df, table_name=None):
+        # COPY en flujo: el texto (o binario) se genera por bloques mientras el servidor lo lee
+        copy_dataframe(cursor, df, table_name or self.table_name, binary=self.binary_copy)
+
+    def _table_exists(self, cursor, table_name=None):
+        cursor.execute("SELECT to_regclass(%s);", (f'"{table_name or self.table_name}"',))
+        return cursor.fetchone()[0] is not None
+
+    def _enum_types(self, cursor, table_name):
+        # {columna: tipo ENUM} de una tabla existente, leídos del catálogo
+        cursor.execute(
+            "SELECT column_name, udt_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = %s AND data_type = 'USER-DEFINED';",
+            (table_name,))
+        return dict(cursor.fetchall())
+
+    def _extend_enums(self, cursor, df):
+        # Categorías nuevas del lote se agregan a los ENUM existentes
+        enum_types = self._enum_types(cursor, self.table_name)
+        for col in df.columns:
+            dtype = df[col].dtype
+            if col in enum_types and isinstance(dtype, pd.CategoricalDtype):
+                for c in dtype.categories:
+                    cursor.execute(f'ALTER TYPE "{enum_types[col]}" ADD VALUE IF NOT EXISTS %s;', (str(c),))
+
+    def _conflict_columns(self, df):
+        # En una tabla particionada el índice único debe incluir las columnas de partición
+        columns = list(self.upsert_key)
+        if self._is_partitioned(df):
+            columns += [col for col in PARTITION_COLUMNS if col not in columns]
+        return columns
+
+    def _ensure_unique_index(self, cursor, table_name, columns):
+        cursor.execute(
+            "SELECT array_agg(a.attname::text ORDER BY a.attname) FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = to_regclass(%s) AND i.indisunique GROUP BY i.indexrelid;",
+            (f'"{table_name}"',))
+        if sorted(columns) not in [row[0] for row in cursor.fetchall()]:
+            columns_sql = ", ".join(f'"{col}"' for col in columns)
+            cursor.execute(f'CREATE UNIQUE INDEX ON "{table_name}" ({columns_sql});')
+
+    def _bump_version(self, cursor, mark: tuple = None, forward_only: bool = False):
+        # Se confirma junto con la escritura: un lector nunca ve datos nuevos con la versión anterior
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS "{CONTROL_TABLE}" '
+                       f'(tabla TEXT PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0, base TEXT, parte INTEGER);')
+        cursor.execute(f'INSERT INTO "{CONTROL_TABLE}" (tabla, version) VALUES (%s, 1) '
+                       f'ON CONFLICT (tabla) DO UPDATE SET version = "{CONTROL_TABLE}".version + 1;',
+                       (self.table_name,))
+        if mark is None:
+            return
+        base, part = mark
+        sql = f'UPDATE "{CONTROL_TABLE}" SET base = %s, parte = %s WHERE tabla = %s'
+        params = [base, part, self.table_name]
+        if forward_only:
+            # Si otra exportación ya envió estas partes, la transacción se deshace sin duplicar filas
+            sql += ' AND (base IS DISTINCT FROM %s OR parte IS NULL OR parte < %s)'
+            params += [base, part]
+        cursor.execute(sql + ';', params)
+        if cursor.rowcount == 0:
+            raise ValueError("Estas partes ya se exportaron a PostgreSQL.")
+
+    def export_mark(self):
+        # (base, parte) de la última exportación, o None si la tabla o la marca no existen
+        with self.connection() as conn, conn.cursor() as cursor:
+            mark = None
+            if self._table_exists(cursor) and self._table_exists(cursor, CONTROL_TABLE):
+                cursor.execute(f'SELECT base, parte FROM "{CONTROL_TABLE}" WHERE tabla = %s;', (self.table_name,))
+                row = cursor.fetchone()
+                if row is not None and row[0] is not None:
+                    mark = (row[0], row[1])
+            conn.rollback()
+        return mark
 
     def save_to_postgresql_copy(self, df):
+        self.save_chunks_to_postgresql_copy([df])
+
+    def save_chunks_to_postgresql_copy(self, chunks, mark: tuple = None):
+        # Recarga completa: se llena una tabla nueva y al final se intercambia por la vigente
+        new_table = f"{self.table_name}__{uuid.uuid4().hex[:8]}"
         try:
-            conn_str = (
-                f"dbname='{self.params['database']}' user='{self.params['user']}' "
-                f"password='{self.params['password']}' host='{self.params['host']}' port='{self.params['port']}'"
-            )
-            conn = psycopg2.connect(conn_str)
-            cursor = conn.cursor()
-
-            cursor.execute(f'DROP TABLE IF EXISTS "{self.table_name}";')
-            conn.commit()
+            with self.connection() as conn, conn.cursor() as cursor:
+                try:
+                    created, partitions = False, set()
+                    for df in chunks:
+                        if not created:
+                            self.create_table_from_df(cursor, new_table, df)
+                            created = True
+                        if self._is_partitioned(df):
+                            self._create_partitions(cursor, new_table, df, partitions)
+                        self._copy_df(cursor, df, new_table)
+                    if not created:
+                        raise ValueError("No se recibieron datos para guardar.")
+                    if self.upsert_key:
+                        # El índice se construye una vez con los datos ya cargados
+                        self._ensure_unique_index(cursor, new_table, self._conflict_columns(df))
+                    conn.commit()
+                except Exception:
+                    self._discard_table(conn, new_table)
+                    raise
 
-            self.create_table_from_df(cursor, self.table_name, df)
-            conn.commit()
+                # Intercambio en una sola transacción; los ENUM de la tabla anterior se eliminan con ella
+                old_enums = self._enum_types(cursor, self.table_name).values()
+                cursor.execute(f'DROP TABLE IF EXISTS "{self.table_name}";')
+                cursor.execute(f'ALTER TABLE "{new_table}" RENAME TO "{self.table_name}";')
+                for enum_type in old_enums:
+                    cursor.execute(f'DROP TYPE IF EXISTS "{enum_type}";')
+                self._rename_objects(cursor, new_table, self.table_name)
+                self._bump_version(cursor, mark)
+                conn.commit()
+
+            print(f"✅ Datos guardados en PostgreSQL: tabla '{self.table_name}'")
 
-            csv_buffer = io.BytesIO()
-            df.to_csv(csv_buffer, sep='\t', index=False, header=False, encoding='utf-8')
-            csv_buffer.seek(0)
-            csv_data = csv_buffer.read().decode('utf-8', errors='replace')
-            csv_str_io = io.StringIO(csv_data)
+        except Exception as e:
+            print(f"❌ Error al guardar en PostgreSQL: {str(e)}")
+            raise
 
-            cursor.copy_from(csv_str_io, self.table_name, sep='\t')
+    def _rename_objects(self, cursor, old_prefix, new_prefix):
+        # Particiones, índices y ENUM creados con el nombre de la tabla nueva toman el definitivo
+        cursor.execute(
+            "SELECT relname, relkind FROM pg_class "
+            "WHERE relnamespace = current_schema()::regnamespace AND left(relname, %s) = %s;",
+            (len(old_prefix) + 1, old_prefix + "_"))
+        for name, kind in cursor.fetchall():
+            statement = 'INDEX' if kind in ('i', 'I') else 'TABLE'
+            cursor.execute(f'ALTER {statement} "{name}" RENAME TO "{new_prefix + name[len(old_prefix):]}";')
+        cursor.execute(
+            "SELECT typname FROM pg_type WHERE typnamespace = current_schema()::regnamespace "
+            "AND typtype = 'e' AND left(typname, %s) = %s;",
+            (len(old_prefix) + 1, old_prefix + "_"))
+        for (name,) in cursor.fetchall():
+            cursor.execute(f'ALTER TYPE "{name}" RENAME TO "{new_prefix + name[len(old_prefix):]}";')
+
+    def _discard_table(self, conn, table_name):
+        # Limpieza tras un error: la tabla vigente no se toca
+        try:
+            conn.rollback()
+            with conn.cursor() as cursor:
+                enum_types = self._enum_types(cursor, table_name).values()
+                cursor.execute(f'DROP TABLE IF EXISTS "{table_name}";')
+                for enum_type in enum_types:
+                    cursor.execute(f'DROP TYPE IF EXISTS "{enum_type}";')
             conn.commit()
+        except psycopg2.Error as e:
+            print(f"⚠️ No se pudo eliminar la tabla temporal '{table_name}': {str(e)}")
 
-            cursor.close()
-            conn.close()
+    def merge_chunks_to_postgresql(self, chunks, mark: tuple = None):
+        """
+        Carga incremental: sin DROP. Los bloques se copian a una tabla temporal y se
+        insertan en la tabla vigente (creada con el primer bloque si no existe). Con
+        upsert_key, una fila cuya llave ya existe se actualiza en lugar de duplicarse;
+        si el lote repite una llave se conserva una de sus filas. La marca solo
+        avanza: si ya se había registrado una igual o posterior, no se inserta nada.
+        """
+        staging = f"{self.table_name}__staging"
+        try:
+            with self.connection() as conn, conn.cursor() as cursor:
+                prepared, created, partitions = False, False, set()
+                for df in chunks:
+                    if not prepared:
+                        if self._table_exists(cursor):
+                            self._extend_enums(cursor, df)
+                        else:
+                            self.create_table_from_df(cursor, self.table_name, df)
+                            created = True
+                        if self.upsert_key:
+                            self._ensure_unique_index(cursor, self.table_name, self._conflict_columns(df))
+                        # Los valores nuevos de un ENUM solo se pueden usar tras el commit
+                        conn.commit()
+                        cursor.execute(f'CREATE TEMP TABLE "{staging}" (LIKE "{self.table_name}") ON COMMIT DROP;')
+                        prepared = True
+                    # En una tabla que ya existía, los años o meses nuevos caen en las particiones DEFAULT
+                    if created and self._is_partitioned(df):
+                        self._create_partitions(cursor, self.table_name, df, partitions)
+                    self._copy_df(cursor, df, staging)
 
-            print(f"✅ Datos guardados en PostgreSQL: tabla '{self.table_name}'")
+                if prepared:
+                    columns_sql = ", ".join(f'"{col}"' for col in df.columns)
+                    if self.upsert_key:
+                        key_sql = ", ".join(f'"{col}"' for col in self._conflict_columns(df))
+                        updates = ", ".join(f'"{col}" = EXCLUDED."{col}"' for col in df.columns
+                                            if col not in self._conflict_columns(df))
+                        cursor.execute(
+                            f'INSERT INTO "{self.table_name}" ({columns_sql}) '
+                            f'SELECT DISTINCT ON ({key_sql}) {columns_sql} FROM "{staging}" '
+                            f'ON CONFLICT ({key_sql}) DO ' + (f'UPDATE SET {updates};' if updates else 'NOTHING;'))
+                    else:
+                        cursor.execute(f'INSERT INTO "{self.table_name}" ({columns_sql}) '
+                                       f'SELECT {columns_sql} FROM "{staging}";')
+                    self._bump_version(cursor, mark, forward_only=True)
+                conn.commit()
+
+            print(f"✅ Datos agregados en PostgreSQL: tabla '{self.table_name}'")
 
         except Exception as e:
-            print(f"❌ Error al guardar en PostgreSQL: {str(e)}")
+            print(f"❌ Error al agregar en PostgreSQL: {str(e)}")
             raise
 
     def load_data(self, file_path: str) -> pd.DataFrame:
@@ -92,3 +346,35 @@ class FileManager:
             self.save_to_postgresql_copy(df)
         else:
             raise ValueError("Formato no soportado para guardar.")
+
+    def save_data_chunks(self, chunks, output_path: str) -> int:
+        """
+        Igual que save_data, pero escribe bloque por bloque: el archivo completo
+        nunca está en memoria como un solo DataFrame. En Excel el libro lo arma el
+        motor de escritura, y la hoja admite a lo más EXCEL_MAX_ROWS filas.
+        """
+        extension = os.path.splitext(output_path)[1].lower()
+        if extension not in ['.csv', '.xlsx', '.xls', '.json']:
+            raise ValueError("Formato no soportado para guardar.")
+        rows = 0
+        if extension == '.csv':
+            for df in chunks:
+                df.to_csv(output_path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+                rows += len(df)
+        elif extension == '.json':
+            # Un solo arreglo de registros, como to_json(orient='records')
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write('[')
+                for df in chunks:
+                    if len(df):
+                        f.write((',' if rows else '') + df.to_json(orient='records')[1:-1])
+                        rows += len(df)
+                f.write(']')
+        else:
+            with pd.ExcelWriter(output_path) as writer:
+                for df in chunks:
+                    if rows + len(df) > EXCEL_MAX_ROWS:
+                        raise ValueError(f"Excel admite a lo más {EXCEL_MAX_ROWS} filas; use CSV o PostgreSQL.")
+                    df.to_excel(writer, index=False, header=rows == 0, startrow=rows + 1 if rows else 0)
+                    rows += len(df)
+        return rows
@@ -0,0 +1,280 @@
+import glob
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from data_cleaner import DataCleaner, MEDIAN_COLUMNS, dtypes_from_kinds, pipeline_version
+from data_store import DataStore, ARCHIVOS_GUARDADOS
+from dataset_cache import file_fingerprint
+from eda_summary import CategoricalSummary, NumericSummary, extend_cached
+from schema_inference import SchemaInference
+
+INCREMENTAL_DIR = os.path.join(ARCHIVOS_GUARDADOS, "incremental")
+MAX_SEGMENTS = 16
+
+
+def row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    # Numéricos como float64 y el resto como objeto: el mismo renglón da el mismo hash
+    # sin importar con qué tipos se leyó cada archivo
+    normalized = chunk.apply(
+        lambda s: s.astype('float64') if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+        else s.astype('object'))
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+class RowHashIndex:
+    """
+    Índice persistente de los hashes de las filas ya cargadas. Cada lote agrega un
+    segmento ordenado (.npy) y la búsqueda se hace con searchsorted sobre cada
+    segmento abierto con memory-map, de modo que agregar un lote cuesta en
+    proporción al lote y no al historial. Con más de MAX_SEGMENTS segmentos se
+    compactan en uno.
+    """
+    def __init__(self, root: str):
+        self.root = root
+
+    def _segments(self) -> list:
+        return sorted(glob.glob(os.path.join(self.root, "hashes_*.npy")))
+
+    def __len__(self) -> int:
+        return sum(len(np.load(path, mmap_mode='r')) for path in self._segments())
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(hashes), dtype=bool)
+        for path in self._segments():
+            segment = np.load(path, mmap_mode='r')
+            if not len(segment):
+                continue
+            pos = np.searchsorted(segment, hashes).clip(max=len(segment) - 1)
+            found |= segment[pos] == hashes
+        return found
+
+    def _write(self, hashes: np.ndarray, number: int):
+        path = os.path.join(self.root, f"hashes_{number:06d}.npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, hashes)
+        os.replace(path + ".tmp", path)
+
+    def add(self, hashes: np.ndarray):
+        os.makedirs(self.root, exist_ok=True)
+        segments = self._segments()
+        number = int(os.path.basename(segments[-1])[len("hashes_"):-len(".npy")]) + 1 if segments else 1
+        self._write(np.unique(hashes), number)
+        if len(segments) + 1 > MAX_SEGMENTS:
+            merged = np.unique(np.concatenate([np.load(path) for path in self._segments()]))
+            self._write(merged, number + 1)
+            for path in self._segments()[:-1]:
+                os.remove(path)
+
+    def clear(self):
+        for path in self._segments():
+            os.remove(path)
+
+
+class IncrementalLoader:
+    """
+    Carga incremental (solo agregar) de lotes nuevos de reservas. Mantiene, junto al
+    almacén, un índice de hashes de las filas originales ya cargadas y las
+    estadísticas que usa la limpieza (moda de 'country' y medianas de
+    MEDIAN_COLUMNS) como resúmenes combinables. Un lote nuevo se deduplica contra el
+    índice, actualiza esas estadísticas, se limpia con ellas y se agrega al almacén
+    como una parte nueva.
+
+    El lote limpio se convierte a los tipos del almacén (SchemaInference.conform) en
+    lugar de inferir los suyos: un categórico o un entero reducido no cambia de tipo
+    entre cargas, y un valor que no cabe rechaza el lote antes de escribirlo.
+
+    Las filas ya cargadas no se vuelven a imputar con las estadísticas nuevas, y las
+    medianas salen del histograma de NumericSummary (exactas en columnas enteras,
+    aproximadas al ancho de bin en las continuas).
+    """
+    def __init__(self, store: DataStore = None, root: str = INCREMENTAL_DIR, chunksize: int = 100_000):
+        # Corre en callbacks en segundo plano: sin la caché en memoria del proceso
+        self.store = store or DataStore(cache=None)
+        self.root = root
+        self.chunksize = chunksize
+        self.index = RowHashIndex(root)
+        self.state = self._load_state()
+
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self.root, "estado.json")
+
+    def _load_state(self):
+        if not os.path.exists(self._state_path):
+            return None
+        with open(self._state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        state['country'] = CategoricalSummary.from_dict(state['country'])
+        state['medians'] = {col: NumericSummary.from_dict(data) for col, data in state['medians'].items()}
+        return state
+
+    def _save_state(self):
+        os.makedirs(self.root, exist_ok=True)
+        data = dict(self.state,
+                    country=self.state['country'].to_dict(),
+                    medians={col: summary.to_dict() for col, summary in self.state['medians'].items()})
+        with open(self._state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(self._state_path + ".tmp", self._state_path)
+
+    def has_state(self) -> bool:
+        # El estado solo sirve si corresponde a la versión vigente del almacén
+        return (self.state is not None and self.store.exists()
+                and tuple(self.state['dataset_key']) == self.store.stored_key())
+
+    def _observe(self, chunk: pd.DataFrame, seen_in_batch: np.ndarray):
+        """
+        Marca las filas nuevas del bloque (ni en el índice ni repetidas en el lote) y
+        suma a las estadísticas las que pasarían el filtro de fechas de la limpieza.
+        """
+        for col, dtype in chunk.dtypes.items():
+            self.state['kinds'].setdefault(col, [])
+            if dtype.kind not in self.state['kinds'][col]:
+                self.state['kinds'][col].append(dtype.kind)
+
+        hashes = row_hashes(chunk)
+        repeated = pd.Series(hashes).duplicated().to_numpy().copy()
+        repeated |= self.index.contains(hashes)
+        if len(seen_in_batch):
+            pos = np.searchsorted(seen_in_batch, hashes).clip(max=len(seen_in_batch) - 1)
+            repeated |= seen_in_batch[pos] == hashes
+        keep = ~repeated
+
+        valid = keep.copy()
+        if 'reservation_status_date' in chunk.columns:
+            valid &= pd.to_datetime(chunk['reservation_status_date'], errors='coerce').notna().to_numpy()
+        if 'country' in chunk.columns:
+            self.state['country'].update(chunk.loc[valid, 'country'])
+        for col in MEDIAN_COLUMNS:
+            if col in chunk.columns:
+                self.state['medians'].setdefault(col, NumericSummary()).update(chunk.loc[valid, col])
+        return keep, hashes[keep]
+
+    def _new_state(self, dataset_key, steps: list):
+        self.state = {
+            'dataset_key': list(dataset_key),
+            'pipeline_version': pipeline_version(steps),
+            'kinds': {},
+            'country': CategoricalSummary(),
+            'medians': {},
+            'rows': 0,
+            'rows_stored': 0,
+        }
+
+    def cleaning_stats(self) -> dict:
+        # Mismo formato que StreamingCleaner.compute_stats, para DataCleaner(stats=...)
+        top = self.state['country'].top(1)
+        return {
+            'country_mode': top[0][0] if top else None,
+            'medians': {col: summary.quantile(0.5) for col, summary in self.state['medians'].items()
+                        if summary.count},
+            'dtypes': dtypes_from_kinds({col: set(kinds) for col, kinds in self.state['kinds'].items()}),
+        }
+
+    def rebuild(self, raw_chunks, dataset_key, steps: list, rows_stored: int):
+        """
+        Reinicia el índice y las estadísticas a partir de los datos originales de una
+        carga completa (un iterable de bloques, p. ej. [df] o pd.read_csv(..., chunksize=...)).
+        rows_stored son las filas limpias que la carga completa dejó en el almacén.
+        """
+        self.index.clear()
+        self._new_state(dataset_key, steps)
+        self.state['rows_stored'] = int(rows_stored)
+        seen = np.empty(0, dtype=np.uint64)
+        for chunk in raw_chunks:
+            keep, new_hashes = self._observe(chunk, seen)
+            seen = np.sort(np.concatenate([seen, new_hashes]), kind='mergesort')
+            self.state['rows'] += int(keep.sum())
+        self.index.add(seen)
+        self._save_state()
+
+    def _read_batch(self, file_path: str):
+        # Se leen con los tipos de la carga completa para que los bloques sean compatibles,
+        # salvo los enteros: se infieren (int64, o float64 si el lote trae nulos) para que
+        # _observe registre el tipo real y no el de una conversión forzada
+        header = pd.read_csv(file_path, nrows=0).columns
+        dtypes = {col: dtype for col, dtype in self.cleaning_stats()['dtypes'].items()
+                  if col in header and dtype != 'int64'}
+        return pd.read_csv(file_path, chunksize=self.chunksize, dtype=dtypes)
+
+    def append_file(self, file_path: str, steps: list, progress=None) -> dict:
+        """
+        Limpia solo el lote nuevo y lo agrega al almacén. Devuelve un reporte con el
+        mismo formato que DataCleaner.run, más 'rows_total' (filas en el almacén, del
+        conteo guardado en el estado: no se recorre el historial).
+        progress(porcentaje) se llama tras cada etapa.
+        """
+        if not self.has_state():
+            raise ValueError("No hay una carga completa previa para este almacén; ejecute primero una carga completa.")
+        if pipeline_version(steps) != self.state['pipeline_version']:
+            raise ValueError("Los pasos de limpieza cambiaron desde la carga completa; ejecute una carga completa.")
+
+        start_total = time.perf_counter()
+        old_key = self.store.stored_key()
+
+        # 1. Filas nuevas y estadísticas actualizadas con ellas
+        start = time.perf_counter()
+        keep_masks, seen = [], np.empty(0, dtype=np.uint64)
+        for chunk in self._read_batch(file_path):
+            keep, new_hashes = self._observe(chunk, seen)
+            keep_masks.append(keep)
+            seen = np.sort(np.concatenate([seen, new_hashes]), kind='mergesort')
+        rows_in = int(sum(len(mask) for mask in keep_masks))
+        rows_new = int(sum(mask.sum() for mask in keep_masks))
+        dedup_seconds = time.perf_counter() - start
+        if progress is not None:
+            progress(40)
+
+        # 2. Limpieza del lote con las estadísticas globales y con los tipos del almacén
+        stats = self.cleaning_stats()
+        store_dtypes, inference = self.store.dtypes(), SchemaInference()
+        clean_steps = [name for name in steps if name != 'drop_duplicates']
+        totals = {name: {'step': name, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0, 'peak_memory_bytes': None}
+                  for name in clean_steps}
+        cleaned = []
+        for chunk, keep in zip(self._read_batch(file_path), keep_masks):
+            cleaner = DataCleaner(chunk[keep], stats=stats, copy=False)
+            for step in cleaner.run(clean_steps, track_memory=False)['steps']:
+                total = totals[step['step']]
+                total['seconds'] += step['seconds']
+                total['rows_in'] += step['rows_in']
+                total['rows_out'] += step['rows_out']
+            cleaned.append(cleaner.get_dataframe())
+        delta = inference.conform(pd.concat(cleaned, ignore_index=True), store_dtypes) if cleaned else pd.DataFrame()
+        if progress is not None:
+            progress(70)
+
+        # 3. Se agrega al almacén con una llave nueva; el índice y el estado se guardan después.
+        # Las filas nuevas entran al índice aunque la limpieza las descarte todas: ya se
+        # sumaron a las estadísticas y no deben contarse otra vez si el archivo se repite
+        if len(delta):
+            digest = hashlib.sha256(f"{old_key[0]}|{file_fingerprint(file_path)}".encode("utf-8")).hexdigest()
+            new_key = (digest, old_key[1])
+            self.store.append(delta, new_key)
+            self.state['dataset_key'] = list(new_key)
+            extend_cached(old_key, new_key, delta, self.store.columns())
+        if len(seen):
+            self.index.add(seen)
+        self.state['rows'] += rows_new
+        self.state['rows_stored'] += len(delta)
+        self._save_state()
+        if progress is not None:
+            progress(100)
+
+        step_reports = list(totals.values())
+        if 'drop_duplicates' in steps:
+            step_reports.insert(0, {'step': 'drop_duplicates', 'seconds': dedup_seconds, 'rows_in': rows_in,
+                                    'rows_out': rows_new, 'peak_memory_bytes': None})
+        self.delta = delta
+        return {
+            'pipeline_version': self.state['pipeline_version'],
+            'steps': step_reports,
+            'rows_in': rows_in,
+            'rows_out': len(delta),
+            'rows_total': self.state['rows_stored'],
+            'total_seconds': time.perf_counter() - start_total,
+            'incremental': True,
+        }
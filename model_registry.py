@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import time
+import joblib
+
+MODELOS_DIR = os.path.join("archivos_guardados", "modelos")
+
+
+def describe(metadata: dict) -> str:
+    # Línea corta para mostrar en las páginas de dónde salió el modelo
+    origen = "cargado del registro" if metadata.get('from_registry') else "entrenado ahora"
+    return (f"🗂️ Modelo {origen}: {metadata['rows']} filas, "
+            f"{metadata['train_seconds']:.2f} s de entrenamiento ({metadata['trained_at']})")
+
+
+class ModelRegistry:
+    """
+    Registro de modelos entrenados. Cada modelo se guarda con joblib bajo una llave
+    formada por el nombre del modelo, la huella del dataset, las columnas usadas y
+    los hiperparámetros; si nada de eso cambió, se carga en lugar de reentrenar.
+    Junto al modelo se guardan sus metadatos (tiempo de entrenamiento, métricas,
+    número de filas y el texto del reporte).
+    """
+    def __init__(self, root: str = MODELOS_DIR):
+        self.root = root
+
+    def model_key(self, name: str, dataset_key, features: list, params: dict) -> str:
+        if isinstance(dataset_key, (tuple, list)):
+            dataset_key = "|".join(dataset_key)
+        payload = json.dumps(
+            {'name': name, 'dataset': dataset_key, 'features': list(features), 'params': params},
+            sort_keys=True, default=str)
+        return f"{name}_{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+    def _paths(self, key: str):
+        return os.path.join(self.root, f"{key}.joblib"), os.path.join(self.root, f"{key}.json")
+
+    def load(self, key: str):
+        model_path, meta_path = self._paths(key)
+        if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return joblib.load(model_path), metadata
+
+    def save(self, key: str, model, metadata: dict):
+        os.makedirs(self.root, exist_ok=True)
+        model_path, meta_path = self._paths(key)
+        # Escritura atómica: otro proceso puede estar entrenando el mismo modelo
+        joblib.dump(model, model_path + ".tmp")
+        os.replace(model_path + ".tmp", model_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def fetch(self, name: str, dataset_key, features: list, params: dict):
+        # (modelo, metadatos) si ya está registrado; None si no (sin entrenar nada)
+        if not dataset_key:
+            return None
+        entry = self.load(self.model_key(name, dataset_key, features, params))
+        if entry is not None:
+            entry[1]['from_registry'] = True
+        return entry
+
+    def fetch_or_train(self, name: str, dataset_key, features: list, params: dict, train_fn):
+        """
+        Devuelve (modelo, metadatos). train_fn() debe regresar (modelo, reporte,
+        métricas, filas) y solo se llama si el modelo no está registrado.
+        """
+        entry = self.fetch(name, dataset_key, features, params)
+        if entry is not None:
+            return entry
+        key = self.model_key(name, dataset_key, features, params) if dataset_key else None
+
+        start = time.perf_counter()
+        model, report, metrics, rows = train_fn()
+        metadata = {
+            'name': name,
+            'features': list(features),
+            'params': params,
+            'train_seconds': time.perf_counter() - start,
+            'trained_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'rows': int(rows),
+            'metrics': metrics,
+            'report': report,
+        }
+        if key is not None:
+            self.save(key, model, metadata)
+        metadata['from_registry'] = False
+        return model, metadata
+
+    def list_models(self) -> list:
+        if not os.path.exists(self.root):
+            return []
+        models = []
+        for filename in sorted(os.listdir(self.root)):
+            if filename.endswith(".json"):
+                with open(os.path.join(self.root, filename), "r", encoding="utf-8") as f:
+                    models.append(dict(json.load(f), key=filename[:-len(".json")]))
+        return models
@@ -5,25 +5,56 @@ import pandas as pd
 import os
 import plotly.express as px
 import plotly.figure_factory as ff
+from threadpoolctl import threadpool_limits
 from data_analysis import (
     CancellationPredictor,
     StayLengthEstimator,
     CustomerSegmentation,
     TemporalAnalysis
 )
+from data_store import open_store
+from model_registry import ModelRegistry, describe
+from plotting import scatter_figure
+from eda_summary import correlation_store
 
 dash.register_page(__name__, path="/data_mining", name="Míneria de datos")
 
+# Los cuatro análisis corren a la vez, cada uno en su propio proceso; los núcleos
+# disponibles (MINING_CORE_BUDGET, por defecto todos) se reparten entre ellos
+N_ANALISIS = 4
+CORE_BUDGET = int(os.environ.get("MINING_CORE_BUDGET", os.cpu_count() or 1))
+JOBS_POR_ANALISIS = max(1, CORE_BUDGET // N_ANALISIS)
+# En esos procesos la caché en memoria del servidor no sirve (no se comparte y lo que
+# se guarda en ella se pierde): cada análisis lee solo sus columnas del archivo Arrow
+# con memory-map, y los modelos y resúmenes vienen de sus cachés en disco
+
+STAY_COLUMNS = ['lead_time', 'adr', 'previous_bookings_not_canceled', 'required_car_parking_spaces', 'total_nights']
+CLUSTER_COLUMNS = ['lead_time', 'adr', 'total_nights']
+TEMPORAL_COLUMNS = ['arrival_date_year', 'arrival_date_month', 'is_canceled']
+
+CANCEL_MINING = [Input("btn-cancel-mining", "n_clicks")]
+
 layout = dbc.Container([
     dcc.Location(id="url"),
     html.Div( [
         html.Img(src="/assets/data_mining.png", style={"height": "35px", "align":"center", "margin-right": "20px", "justify":"center", "margin-top": "20px"}),
         html.H2("Minería de datos", className="my-3")], style={"display":"flex"}),
-    html.Div(id="mining-results", style={"whiteSpace": "pre-wrap", "marginBottom": "20px"}),
-    html.Div(id="scatter-plots"),
-    html.Div(id="heatmap"),
-    html.Div(id="dendrogram"),
-    html.Div(id="temporal"),
+    dbc.Button("Cancelar análisis", id="btn-cancel-mining", color="danger", size="sm", className="mb-3"),
+    # Cada sección se muestra en cuanto termina su análisis; los dos más largos reportan su avance
+    dbc.Progress(id="stay-progress-bar", value=0, striped=True, animated=True, className="mb-2"),
+    dcc.Loading(html.Div([
+        html.Div(id="stay-results", style={"whiteSpace": "pre-wrap", "marginBottom": "20px"}),
+        html.Div(id="scatter-plots"),
+    ])),
+    dbc.Progress(id="mining-progress-bar", value=0, striped=True, animated=True, className="mb-2"),
+    dcc.Loading(html.Div([
+        html.Div(id="segment-results", style={"whiteSpace": "pre-wrap", "marginBottom": "20px"}),
+        html.Div(id="segment-scatter"),
+        html.Div(id="k-sweep"),
+        html.Div(id="dendrogram"),
+    ])),
+    dcc.Loading(html.Div(id="heatmap")),
+    dcc.Loading(html.Div(id="temporal")),
     html.Br(),
     dbc.Button("⬅️ Volver a EDA", href="/eda", color="secondary", className="mt-3"),
     dbc.Button("➡️ Visualizar objetivo", href="/goal", color="info", className="mt-3", style={"margin-left": "10px"}),
@@ -31,95 +62,162 @@ layout = dbc.Container([
 ])
 
 @dash.callback(
-    Output("mining-results", "children"),
+    Output("stay-results", "children"),
     Output("scatter-plots", "children"),
-    Output("heatmap", "children"),
-    Output("dendrogram", "children"),
-    Output("temporal", "children"),
-    Input("url", "pathname")
+    Input("url", "pathname"),
+    background=True,                           # Cada análisis se entrena en su propio proceso
+    progress=[Output("stay-progress-bar", "value"), Output("stay-progress-bar", "label")],
+    cancel=CANCEL_MINING,
 )
-def mostrar_mineria(pathname):
+def mineria_estancia(set_progress, pathname):
     if pathname != "/data_mining":
-        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        return dash.no_update, dash.no_update
 
-    temp_path = os.path.join("archivos_guardados", "limpio_temp.csv")
-    if not os.path.exists(temp_path):
-        return "❌ No hay datos limpios disponibles.", "", "", "", ""
+    set_progress((0, "0%"))
+    store = open_store(cache=None)
+    if not store.exists():
+        return "❌ No hay datos limpios disponibles.", ""
 
-    df = pd.read_csv(temp_path)
-    results = ""
-    scatter_plots = []
-    heatmap_fig = html.Div()
-    dendro_fig = html.Div()
-    temporal_fig = html.Div()
+    df = store.load(columns=STAY_COLUMNS)
+    set_progress((20, "20%"))
 
     # 1. Estimación de duración de estancia (Regresión)
     try:
-        estimator = StayLengthEstimator()
+        estimator = StayLengthEstimator(
+            n_jobs=JOBS_POR_ANALISIS, registry=ModelRegistry(), dataset_key=store.stored_key())
         stay_text = estimator.train_and_report(df)
-        results += (
+        set_progress((80, "80%"))
+        results = (
             "🔎 **Estimación de Duración de Estancia**\n"
             "Se utiliza un Random Forest para predecir el número de noches de estancia. "
             "La métrica principal es el error absoluto medio (MAE).\n\n"
-            f"{stay_text}\n"
+            f"{stay_text}\n{describe(estimator.metadata)}\n"
         )
         # Scatter plot: adr vs total_nights
+        scatter_plot = ""
         if 'adr' in df.columns and 'total_nights' in df.columns:
-            scatter_plots.append(
-                html.Div([
-                    html.P("Relación entre adr y total_nights:"),
-                    dcc.Graph(figure=px.scatter(
-                        df, x='adr', y='total_nights',
-                        title="Scatter: adr vs total_nights"
-                    ))
-                ])
-            )
+            scatter_plot = html.Div([
+                html.P("Relación entre adr y total_nights:"),
+                dcc.Graph(figure=scatter_figure(
+                    df, x='adr', y='total_nights',
+                    title="Scatter: adr vs total_nights"
+                ))
+            ])
+        set_progress((100, "100%"))
+        return results, scatter_plot
     except Exception as e:
-        results += f"❌ Error en modelo de estancia: {e}\n"
+        return f"❌ Error en modelo de estancia: {e}\n", ""
+
+
+@dash.callback(
+    Output("segment-results", "children"),
+    Output("segment-scatter", "children"),
+    Output("k-sweep", "children"),
+    Output("dendrogram", "children"),
+    Input("url", "pathname"),
+    background=True,
+    progress=[Output("mining-progress-bar", "value"), Output("mining-progress-bar", "label")],
+    cancel=CANCEL_MINING,
+)
+def mineria_segmentacion(set_progress, pathname):
+    if pathname != "/data_mining":
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    set_progress((0, "0%"))
+    store = open_store(cache=None)
+    if not store.exists():
+        return "", "", "", ""
+
+    df = store.load(columns=CLUSTER_COLUMNS)
+    set_progress((10, "10%"))
+    scatter_plot = ""
+    sweep_fig = html.Div()
+    dendro_fig = html.Div()
 
     # 2. Segmentación de clientes (Clustering)
     try:
-        segmentador = CustomerSegmentation(n_clusters=4)
-        df_small = df.sample(min(500, len(df)), random_state=42) if len(df) > 500 else df
-        df_cluster = segmentador.segment(df_small)
-        cluster_counts = df_cluster['cluster'].value_counts().to_dict()
-        results += (
+        # KMeans usa hilos de OpenMP/BLAS: se limitan a la parte del presupuesto de este análisis
+        with threadpool_limits(limits=JOBS_POR_ANALISIS):
+            # k se elige con un barrido en paralelo; el barrido queda en el registro
+            segmentador = CustomerSegmentation(
+                n_clusters='auto', registry=ModelRegistry(), dataset_key=store.stored_key(),
+                n_jobs=JOBS_POR_ANALISIS)
+            # Se entrena por bloques sobre todo el almacén y se asigna clúster a cada fila
+            segmentador.fit_chunks(lambda: store.iter_chunks(columns=CLUSTER_COLUMNS))
+            set_progress((50, "50%"))
+            df['cluster'] = segmentador.predict_cluster(df)
+            df_cluster = df[df['cluster'] >= 0]
+        set_progress((60, "60%"))
+        cluster_counts = df_cluster['cluster'].value_counts().sort_index().to_dict()
+        results = (
             "🔎 **Segmentación de Clientes (K-Means)**\n"
-            "Se agrupan los clientes en 4 clústeres usando lead_time, adr y total_nights. "
+            f"Se agrupan los clientes en {segmentador.n_clusters} clústeres usando lead_time, adr y total_nights. "
             "Esto ayuda a identificar diferentes perfiles de clientes.\n\n"
-            f"Distribución de clústeres: {cluster_counts}\n\n"
+            f"Distribución de clústeres: {cluster_counts}\n{describe(segmentador.metadata)}\n\n"
         )
         # Scatter plot: lead_time vs adr coloreado por cluster
         if 'lead_time' in df_cluster.columns and 'adr' in df_cluster.columns and 'cluster' in df_cluster.columns:
-            scatter_plots.append(
-                html.Div([
-                    html.P("Clusters de clientes según lead_time y adr:"),
-                    dcc.Graph(figure=px.scatter(
-                        df_cluster, x='lead_time', y='adr', color='cluster',
-                        title="Clusters de clientes (lead_time vs adr)"
-                    ))
-                ])
-            )
-        # Dendrograma para visualizar la similitud entre clientes
-        from scipy.cluster.hierarchy import linkage
-        from scipy.spatial.distance import pdist
-        dendro_df = df_cluster[['lead_time', 'adr', 'total_nights']].dropna()
-        if len(dendro_df) > 1:
+            scatter_plot = html.Div([
+                html.P("Clusters de clientes según lead_time y adr:"),
+                dcc.Graph(figure=scatter_figure(
+                    df_cluster, x='lead_time', y='adr', color='cluster',
+                    title="Clusters de clientes (lead_time vs adr)"
+                ))
+            ])
+        # Curva del barrido de k: codo de la inercia y silueta
+        sweep = pd.DataFrame(segmentador.sweep)
+        sweep_fig = html.Div([
+            html.P(f"Selección automática de k: se eligió k={segmentador.n_clusters} por la mejor silueta."),
+            dbc.Row([
+                dbc.Col(dcc.Graph(figure=px.line(sweep, x='k', y='inertia', markers=True,
+                                                 title="Inercia por k (codo)"))),
+                dbc.Col(dcc.Graph(figure=px.line(sweep, x='k', y='silhouette', markers=True,
+                                                 title="Silueta por k"))),
+            ])
+        ])
+        # Dendrograma sobre micro-clústeres de todas las filas, no sobre filas individuales
+        with threadpool_limits(limits=JOBS_POR_ANALISIS):
+            micro = segmentador.micro_clusters(lambda: store.iter_chunks(columns=CLUSTER_COLUMNS))
+        set_progress((90, "90%"))
+        if len(micro) > 1:
+            etiquetas = [f"{row.clientes} clientes (lt {row.lead_time:.0f}, adr {row.adr:.0f})"
+                         for row in micro.itertuples()]
+            fig_dendro = ff.create_dendrogram(
+                micro[[f"{col}_std" for col in CLUSTER_COLUMNS]].to_numpy(),
+                orientation='left', labels=etiquetas)
+            fig_dendro.update_layout(height=max(450, 14 * len(micro)))
             dendro_fig = html.Div([
-                html.P("Dendrograma de similitud entre clientes:"),
-                dcc.Graph(figure=ff.create_dendrogram(dendro_df, orientation='left'))
+                html.P(f"Dendrograma de similitud entre {len(micro)} grupos de clientes "
+                       f"({int(micro['clientes'].sum())} clientes en total):"),
+                dcc.Graph(figure=fig_dendro)
             ])
+        set_progress((100, "100%"))
+        return results, scatter_plot, sweep_fig, dendro_fig
     except Exception as e:
-        results += f"❌ Error en segmentación: {e}\n"
+        return f"❌ Error en segmentación: {e}\n", scatter_plot, sweep_fig, dendro_fig
+
+
+@dash.callback(
+    Output("temporal", "children"),
+    Input("url", "pathname"),
+    background=True,
+    cancel=CANCEL_MINING,
+)
+def mineria_temporal(pathname):
+    if pathname != "/data_mining":
+        return dash.no_update
+
+    store = open_store(cache=None)
+    if not store.exists():
+        return ""
+
+    df = store.load(columns=TEMPORAL_COLUMNS)
 
     # 3. Análisis de Temporalidad de la Demanda: mes de mayor demanda por año
     try:
         temporal = TemporalAnalysis()
+        # Año y mes ya vienen como enteros, en orden cronológico
         demand_by_month = temporal.monthly_demand(df)
-        # Extrae año y mes
-        demand_by_month[['year', 'month']] = demand_by_month['year_month'].str.split('-', expand=True)
-        demand_by_month['year'] = demand_by_month['year'].astype(int)
-        demand_by_month['month'] = demand_by_month['month'].astype(int)
         # Encuentra el mes de mayor demanda por año
         idx = demand_by_month.groupby('year')['total_reservas'].idxmax()
         top_months = demand_by_month.loc[idx].sort_values('year')
@@ -130,10 +228,25 @@ def mostrar_mineria(pathname):
             title="Mes de Mayor Demanda por Año",
             text='month'
         )
+        # Demanda y tasa de cancelación de todos los meses
+        serie = demand_by_month.assign(mes=demand_by_month['year_month'].astype(str))
+        fig_serie = px.line(
+            serie, x='mes', y='total_reservas', markers=True,
+            hover_data={'tasa_cancelacion': ':.1%'},
+            labels={'mes': 'Mes', 'total_reservas': 'Reservas', 'tasa_cancelacion': 'Tasa de cancelación'},
+            title="Reservas por mes"
+        )
+        fig_tasa = px.bar(
+            serie, x='mes', y='tasa_cancelacion',
+            labels={'mes': 'Mes', 'tasa_cancelacion': 'Tasa de cancelación'},
+            title="Tasa de cancelación por mes"
+        )
+        fig_tasa.update_yaxes(tickformat=".0%")
         explicacion_temporal = (
             html.Div([
                 html.H4("3. Análisis de Temporalidad de la Demanda"),
                 dcc.Graph(figure=fig_temp),
+                dbc.Row([dbc.Col(dcc.Graph(figure=fig_serie)), dbc.Col(dcc.Graph(figure=fig_tasa))]),
                 html.P(
                     "Se muestra el mes con mayor demanda para cada año. "
                     "Esto permite identificar patrones estacionales y planificar estrategias específicas para los meses pico de cada año."
@@ -146,25 +259,35 @@ def mostrar_mineria(pathname):
         )
     except Exception as e:
         explicacion_temporal = html.Div(f"Error en análisis temporal: {e}")
+    return explicacion_temporal
+
 
-    # 4. Heatmap de correlación general
+@dash.callback(
+    Output("heatmap", "children"),
+    Input("url", "pathname"),
+    background=True,
+    cancel=CANCEL_MINING,
+)
+def mineria_correlacion(pathname):
+    if pathname != "/data_mining":
+        return dash.no_update
+
+    store = open_store(cache=None)
+    if not store.exists():
+        return ""
+
+    # 4. Heatmap de correlación general, desde los estadísticos guardados por la limpieza
     try:
-        numeric_cols = df.select_dtypes(include='number').columns
-        if len(numeric_cols) > 1:
-            corr = df[numeric_cols].corr()
+        # Las columnas constantes no tienen correlación definida y se omiten
+        corr = correlation_store(store).dropna(how='all').dropna(axis=1, how='all')
+        if len(corr.columns) > 1:
             heatmap_fig = html.Div([
-                html.P("Mapa de calor de correlación entre variables numéricas:"),
-                dcc.Graph(figure=px.imshow(corr, text_auto=True, title="Heatmap de Correlación"))
+                html.P("Mapa de calor de correlación entre variables numéricas (sin identificadores como agent):"),
+                dcc.Graph(figure=px.imshow(corr, text_auto=".2f", zmin=-1, zmax=1,
+                                           color_continuous_scale="RdBu_r", title="Heatmap de Correlación"))
             ])
         else:
             heatmap_fig = html.Div("No hay suficientes columnas numéricas para heatmap.")
     except Exception as e:
         heatmap_fig = html.Div(f"No se pudo generar heatmap: {e}")
-
-    return (
-        results,
-        html.Div(scatter_plots),
-        heatmap_fig,
-        dendro_fig,
-        temporal_fig
-    )
\ No newline at end of file
+    return heatmap_fig
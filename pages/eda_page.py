@@ -1,21 +1,31 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, dash_table, Input, Output
 import dash_bootstrap_components as dbc
 import pandas as pd
 import os
 import plotly.express as px
 import plotly.graph_objs as go
+import numpy as np
+from data_store import open_store
+from eda_summary import summarize_store
+from data_analysis import profile_from_summaries
 
 
 
 dash.register_page(__name__, path="/eda", name="Míneria de datos (EDA y resultados)")
 
+# Columnas graficadas por defecto; el selector permite elegir cualquier otra numérica
+DEFAULT_COLUMNS = ["arrival_date_day_of_month","stays_in_week_nights","stays_in_weekend_nights","total_nights"]
+
 layout = dbc.Container([
     dcc.Location(id="url"),
     html.Div( [
         html.Img(src="/assets/eda.png", style={"height": "35px", "align":"center", "margin-right": "20px", "justify":"center", "margin-top": "20px"}),
         html.H2("EDA", className="my-3")], style={"display":"flex"}),
-    html.Div(id="eda-stats", style={"whiteSpace": "pre-wrap", "marginBottom": "20px"}),
+    html.H5("Perfil de todas las columnas"),
+    html.Div(id="eda-profile", style={"marginBottom": "20px"}),
+    dcc.Dropdown(id="eda-columns", value=DEFAULT_COLUMNS, multi=True, placeholder="Columnas numéricas a graficar"),
+    html.Div(id="eda-stats", style={"whiteSpace": "pre-wrap", "marginBottom": "20px", "marginTop": "20px"}),
     html.Div(id="eda-hist"),
     html.Div(id="eda-box"),
     html.Br(),
@@ -24,44 +34,71 @@ layout = dbc.Container([
     html.Br()
 ])
 
+def render_profile(profile: pd.DataFrame):
+    return dash_table.DataTable(
+        data=profile.round(2).to_dict("records"),
+        columns=[{"name": i, "id": i} for i in profile.columns],
+        page_size=15,
+        sort_action="native",
+        style_table={"overflowX": "auto", "border": "1px solid #ccc"},
+        style_cell={"textAlign": "left", "fontSize": "13px", "minWidth": "80px", "maxWidth": "300px", "whiteSpace": "normal"},
+    )
+
 @dash.callback(
+    Output("eda-profile", "children"),
+    Output("eda-columns", "options"),
     Output("eda-stats", "children"),
     Output("eda-hist", "children"),
     Output("eda-box", "children"),
-    Input("url", "pathname")
+    Input("url", "pathname"),
+    Input("eda-columns", "value"),
 )
-def mostrar_eda(pathname):
+def mostrar_eda(pathname, selected_columns):
     if pathname != "/eda":
-        return dash.no_update, dash.no_update, dash.no_update
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-    temp_path = os.path.join("archivos_guardados", "limpio_temp.csv")
-    if not os.path.exists(temp_path):
-        return "❌ No hay datos limpios disponibles.", go.Figure(), go.Figure()
+    store = open_store()
+    if not store.exists():
+        return "", [], "❌ No hay datos limpios disponibles.", go.Figure(), go.Figure()
 
-    df = pd.read_csv(temp_path)
-    
-    columns_to_calculate = ["arrival_date_day_of_month","stays_in_week_nights","stays_in_weekend_nights","total_nights"]
+    # Resúmenes de todas las columnas en una pasada, precalculados por versión del dataset:
+    # no se envían las filas al navegador
+    all_summaries = summarize_store(store)
+    profile = profile_from_summaries(all_summaries)
+    numeric_columns = [col for col, summary in all_summaries.items() if summary.kind == "numeric"]
+    summaries = {col: all_summaries[col] for col in (selected_columns or []) if col in numeric_columns}
 
     stats_all = ""
     histograms = []
     boxplots = []
 
-    for col in columns_to_calculate:
-    # Selecciona una columna numérica para el ejemplo, puedes cambiarla
-        media = df[col].mean()
-        mediana = df[col].median()
-        desviacion = df[col].std()
+    for col, summary in summaries.items():
+        box = summary.box()
         stats_all += (
                 f"Columna analizada: {col}\n"
-                f"Media: {media:.2f}\n"
-                f"Mediana: {mediana:.2f}\n"
-                f"Desviación estándar: {desviacion:.2f}\n"
+                f"Media: {summary.mean:.2f}\n"
+                f"Mediana: {box['median']:.2f}\n"
+                f"Desviación estándar: {summary.std:.2f}\n"
             )
-        histograms.append(dcc.Graph(figure=px.histogram(df, x=col, nbins=30, title=f"Histograma de {col}")))
-        boxplots.append(dcc.Graph(figure=px.box(df, y=col, title=f"Boxplot de {col}")))
+        counts, edges = summary.histogram(nbins=30)
+        fig_hist = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=col))
+        fig_hist.update_layout(title=f"Histograma de {col}", xaxis_title=col, yaxis_title="count", bargap=0)
+        histograms.append(dcc.Graph(figure=fig_hist))
+
+        fig_box = go.Figure(go.Box(
+            name=col, q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+            lowerfence=[box['lowerfence']], upperfence=[box['upperfence']],
+            mean=[box['mean']], sd=[box['sd']]))
+        if box['outliers']:
+            fig_box.add_trace(go.Scatter(x=[col] * len(box['outliers']), y=box['outliers'], mode="markers",
+                                         name="atípicos", marker={'size': 4}))
+        fig_box.update_layout(title=f"Boxplot de {col}", showlegend=False)
+        boxplots.append(dcc.Graph(figure=fig_box))
 
     # Devuelve todos los resultados juntos
     return (
+        render_profile(profile),
+        numeric_columns,
         stats_all,
         histograms,
         boxplots
@@ -5,14 +5,24 @@ import pandas as pd                           # Librería para manejo de datos
 import os                                     # Módulo para operaciones con el sistema de archivos
 import uuid                                   # Genera identificadores únicos para nombres de archivo
 import pathlib                                # Manejo avanzado de rutas
-from data_cleaner import DataCleaner          # Clase personalizada para limpiar datos
+import json                                   # Reporte de la ejecución en formato legible por máquina
+from data_cleaner import (                    # Clases y pipeline configurable de limpieza
+    DataCleaner, StreamingCleaner, CLEANING_STEPS, load_pipeline_spec, resolve_pipeline, pipeline_version
+)
 from file_manager import FileManager          # Clase personalizada para guardar datos
+from data_store import DataStore              # Almacén columnar de los datos limpios
+from dataset_cache import raw_frame_cache, file_fingerprint  # Caché en disco de los CSV ya parseados
+from eda_summary import CorrelationStats, save_correlation  # Estadísticos de correlación por versión
+from incremental_etl import IncrementalLoader # Carga incremental de lotes nuevos
 
 dash.register_page(__name__, path="/etl", name="Limpieza ETL")   # Registra esta página bajo la ruta "/etl"
 
 RUTA_TXT = "ruta_actual.txt"                  # Archivo que guarda la ruta del último archivo cargado
 ARCHIVOS_GUARDADOS = "archivos_guardados"     # Carpeta donde se guardarán archivos limpios
 os.makedirs(ARCHIVOS_GUARDADOS, exist_ok=True) # Crea la carpeta si no existe
+STREAMING_THRESHOLD_BYTES = 200 * 1024 ** 2   # A partir de este tamaño se limpia por bloques
+PIPELINE_SPEC = "pipeline_limpieza.yaml"      # Pasos de limpieza (orden y activación)
+REPORTE_ETL = os.path.join(ARCHIVOS_GUARDADOS, "reporte_etl.json")  # Reporte de la última ejecución
 
 
 layout = dbc.Container([
@@ -32,6 +42,7 @@ layout = dbc.Container([
 
     dbc.Row([                                  # Fila con dos columnas: datos originales y limpios
     dbc.Progress(id="etl-progress-bar", value=0, striped=True, animated=True, className="mb-4"),
+    dbc.Button("Cancelar limpieza", id="btn-cancel-etl", color="danger", size="sm", className="mb-3", disabled=True),
 
 
         dbc.Col([
@@ -64,6 +75,8 @@ layout = dbc.Container([
     ),
 
     dbc.Button("Guardar", id="btn-save", color="success", className="mt-2"),  # Botón para guardar
+    dbc.Button("Cancelar", id="btn-cancel-save", color="danger", className="mt-2", style={"margin-left": "10px"}, disabled=True),
+    dbc.Progress(id="save-progress-bar", value=0, className="mt-2"),  # Avance de la exportación
 
     html.Div(id="save-output", className="mt-2", style={"whiteSpace": "pre-wrap"}),  # Resultado del guardado
 
@@ -97,13 +110,17 @@ def render_table(df: pd.DataFrame, limit=100):   # Función que crea una tabla a
     Output("debug-info", "children"),
     Output("debug-console", "children"),
     Output("proceso-etl-detallado", "children"),
-    Input("url", "pathname")
+    Input("url", "pathname"),
+    State("modo-carga", "data"),
+    background=True,                           # Corre en un proceso aparte, sin bloquear al servidor
+    progress=[Output("etl-progress-bar", "value"), Output("etl-progress-bar", "label")],
+    running=[(Output("btn-cancel-etl", "disabled"), False, True)],
+    cancel=[Input("btn-cancel-etl", "n_clicks")],
 )
-def limpiar_auto(pathname):
+def limpiar_auto(set_progress, pathname, modo):
     if pathname != "/etl":
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
     log = ""
-    pasos = []
 
     if not os.path.exists(RUTA_TXT):
         log += "❌ No se encontró ruta_actual.txt\n"
@@ -118,52 +135,125 @@ def limpiar_auto(pathname):
         log += "❌ Archivo no existe\n"
         return html.Div("❌ Archivo perdido"), "", "Archivo faltante", log, ""
 
+    def avance(porcentaje):
+        set_progress((int(porcentaje), f"{int(porcentaje)}%"))
+
     try:
-        df = pd.read_csv(file_path)
+        avance(0)
+        fingerprint = file_fingerprint(file_path)
+        # Este callback corre en otro proceso: la caché en memoria del servidor no se ve aquí
+        # y lo que se guardara en ella se perdería, por eso el CSV parseado se guarda en disco
+        df = raw_frame_cache.get(fingerprint)
+        steps = resolve_pipeline(load_pipeline_spec(PIPELINE_SPEC) if os.path.exists(PIPELINE_SPEC) else None)
+        if modo == "incremental":
+            return limpiar_incremental(file_path, steps, log, avance)
+        if df is None and os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES:
+            return limpiar_por_bloques(file_path, fingerprint, steps, log, avance)
+        if df is None:
+            df = pd.read_csv(file_path)
+            raw_frame_cache.put(fingerprint, df)
+        else:
+            log += "⚡ Datos originales tomados de la caché\n"
         preview_original = render_table(df)
-        pasos.append(html.Li(f"🔍 Registros originales: {df.shape[0]} filas, {df.shape[1]} columnas"))
+        avance(10)
 
         cleaner = DataCleaner(df)
-        cleaner.drop_duplicates()
-        pasos.append(html.Li(f"🧹 Duplicados eliminados. Filas después: {cleaner.df.shape[0]}"))
-
-        cleaner.standardize_dates()
-        pasos.append(html.Li(f"📆 Fechas convertidas y filas con fechas inválidas eliminadas"))
-
-        cleaner.fill_missing_values()
-        pasos.append(html.Li(f"🧩 Valores nulos rellenados en columnas como 'country', 'children', etc."))
-
-        cleaner.advanced_imputation_knn()
-        cleaner.create_new_columns()
-        pasos.append(html.Li(f"➕ Columna 'total_nights' creada"))
-
-        cleaner.validate_numeric_columns()
-        pasos.append(html.Li(f"🔢 Columnas numéricas validadas y convertidas"))
-
-        cleaner.drop_missing_targets()
-        pasos.append(html.Li(f"🚫 Filas sin valor en 'is_canceled' eliminadas"))
-
-        cleaner.drop_unused_columns()
-        pasos.append(html.Li(f"🗑️ Columnas eliminadas: 'company', 'reservation_status'"))
+        report = cleaner.run(steps, progress=lambda hechos, total, paso: avance(10 + 80 * hechos / total))
 
         df_clean = cleaner.get_dataframe()
-        temp_path = os.path.join(ARCHIVOS_GUARDADOS, "limpio_temp.csv")
-        df_clean.to_csv(temp_path, index=False)
+        key = (fingerprint, report['pipeline_version'])
+        DataStore(cache=None).save(df_clean, key=key)
+        save_correlation(key, CorrelationStats().update(df_clean))
+        # Índice de filas y estadísticas de imputación para los lotes incrementales posteriores
+        IncrementalLoader().rebuild([df], key, steps, rows_stored=len(df_clean))
+        guardar_reporte(report)
+        avance(100)
 
         preview_clean = render_table(df_clean)
-        log += "✅ Limpieza completada y archivo guardado automáticamente\n"
-
-        resumen_etl = html.Div([
-            html.H5("🧾 Detalle del Proceso de Limpieza (ETL)"),
-            html.Ul(pasos)
-        ])
+        log += f"✅ Limpieza completada y archivo guardado automáticamente\n🧾 Reporte: {REPORTE_ETL}\n"
 
-        return preview_original, preview_clean, "✅ Datos limpios listos", log, resumen_etl
+        return preview_original, preview_clean, "✅ Datos limpios listos", log, render_reporte(report)
 
     except Exception as e:
         log += f"❌ Error:\n{str(e)}"
         return html.Div("❌ Fallo al procesar archivo"), "", str(e), log, ""
 
+def limpiar_por_bloques(file_path, fingerprint, steps, log, avance):
+    # Archivos grandes: misma limpieza por bloques, sin cargar el archivo completo
+    streaming = StreamingCleaner(file_path, steps=steps)
+    preview_original = render_table(pd.read_csv(file_path, nrows=100))
+    streaming.compute_stats()
+    avance(30)
+
+    store = DataStore(cache=None)
+    key = (fingerprint, pipeline_version(steps))
+    chunks = streaming.iter_clean_chunks(progress=lambda hechas, total: avance(30 + 65 * hechas / max(total, 1)))
+    # Los estadísticos de correlación se acumulan en la misma pasada que escribe el almacén
+    correlation = CorrelationStats()
+
+    def con_correlacion(chunks):
+        for chunk in chunks:
+            correlation.update(chunk)
+            yield chunk
+    rows_stored = store.save_chunks(con_correlacion(chunks), key=key, schema=streaming.output_schema())
+    save_correlation(key, correlation)
+    IncrementalLoader().rebuild(pd.read_csv(file_path, chunksize=streaming.chunksize), key, steps,
+                                rows_stored=rows_stored)
+    guardar_reporte(streaming.report)
+    avance(100)
+    preview_clean = render_table(store.head())
+    log += f"✅ Limpieza por bloques completada y archivo guardado automáticamente\n🧾 Reporte: {REPORTE_ETL}\n"
+
+    return preview_original, preview_clean, "✅ Datos limpios listos", log, render_reporte(streaming.report)
+
+def limpiar_incremental(file_path, steps, log, avance):
+    # Lote nuevo: solo se limpian y agregan las filas que no estaban en las cargas anteriores
+    loader = IncrementalLoader()
+    preview_original = render_table(pd.read_csv(file_path, nrows=100))
+    report = loader.append_file(file_path, steps, progress=avance)
+    guardar_reporte(report)
+    preview_clean = render_table(loader.delta)
+    log += (f"✅ Lote incremental: {report['rows_out']} filas nuevas agregadas "
+            f"({report['rows_total']} en total)\n🧾 Reporte: {REPORTE_ETL}\n")
+
+    return preview_original, preview_clean, "✅ Datos limpios listos", log, render_reporte(report)
+
+def guardar_reporte(report):
+    with open(REPORTE_ETL, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+def render_reporte(report):
+    # Un renglón por paso con su costo; se resalta el paso más lento
+    pasos = [html.Li(f"🔍 Registros originales: {report['rows_in']} filas")]
+    slowest = max(report['steps'], key=lambda step: step['seconds'])['step'] if report['steps'] else None
+    for step in report['steps']:
+        memoria = (f", memoria pico +{step['peak_memory_bytes'] / 1024 ** 2:.1f} MB"
+                   if step['peak_memory_bytes'] is not None else "")
+        texto = (f"{CLEANING_STEPS[step['step']]} — {step['seconds']:.3f} s, "
+                 f"filas {step['rows_in']} → {step['rows_out']}{memoria}")
+        pasos.append(html.Li(html.B(texto) if step['step'] == slowest else texto))
+    pasos.append(html.Li(f"⏱️ Tiempo total: {report['total_seconds']:.3f} s. Filas finales: {report['rows_out']}"))
+    if report.get('incremental'):
+        pasos.append(html.Li(f"➕ Carga incremental: filas en el almacén tras agregar el lote: {report['rows_total']}"))
+
+    contenido = [html.H5("🧾 Detalle del Proceso de Limpieza (ETL)"), html.Ul(pasos)]
+    if report.get('column_memory'):
+        contenido.append(render_memoria_columnas(report['column_memory']))
+    return html.Div(contenido)
+
+def render_memoria_columnas(column_memory):
+    antes = sum(info['bytes_before'] for info in column_memory.values())
+    despues = sum(info['bytes_after'] for info in column_memory.values())
+    columnas = [
+        html.Li(f"{col}: {info['dtype_before']} → {info['dtype_after']}, "
+                f"{info['bytes_before'] / 1024:.1f} KB → {info['bytes_after'] / 1024:.1f} KB")
+        for col, info in column_memory.items()
+    ]
+    return html.Details([
+        html.Summary(f"📦 Memoria de la tabla limpia: {antes / 1024 ** 2:.2f} MB → {despues / 1024 ** 2:.2f} MB"),
+        html.Ul(columnas)
+    ])
+
 def render_table(df: pd.DataFrame, limit=100):
     return html.Div([
         dash_table.DataTable(
@@ -191,27 +281,67 @@ def render_table(df: pd.DataFrame, limit=100):
     Output("download-cleaned-file", "data"),
     Input("btn-save", "n_clicks"),
     State("save-format", "value"),
-    prevent_initial_call=True
+    State("modo-carga", "data"),
+    prevent_initial_call=True,
+    background=True,                           # La exportación (p. ej. COPY a PostgreSQL) corre en segundo plano
+    progress=[Output("save-progress-bar", "value"), Output("save-progress-bar", "label")],
+    running=[
+        (Output("btn-save", "disabled"), True, False),
+        (Output("btn-cancel-save", "disabled"), False, True),
+    ],
+    cancel=[Input("btn-cancel-save", "n_clicks")],
 )
-def guardar_o_descargar(n, formato):  # Función para guardar o descargar datos limpios. 
+def guardar_o_descargar(set_progress, n, formato, modo):  # Función para guardar o descargar datos limpios.
     try:
-        temp_path = os.path.join(ARCHIVOS_GUARDADOS, "limpio_temp.csv")
-        if not os.path.exists(temp_path):
+        set_progress((0, ""))
+        store = DataStore(cache=None)
+        if not store.exists():
             return "❌ No hay archivo limpio disponible.", None
 
-        df_clean = pd.read_csv(temp_path)
         fm = FileManager()
-
         if formato == "postgresql":
-            fm.save_data(df_clean, "postgresql")   # Guarda en base de datos PostgreSQL.
+            # Marca de exportación: carga completa del almacén y última parte enviada
+            partes = store.part_paths()
+            marca = (store.base_id(), store.part_number(partes[-1]) if partes else 0)
+            previa = fm.export_mark() if modo == "incremental" else None
+            if previa is not None and previa[0] == marca[0]:
+                # Solo las partes posteriores a la última exportada; la tabla existente no se borra
+                pendientes = [p for p in partes if store.part_number(p) > previa[1]]
+                if not pendientes:
+                    set_progress((100, "100%"))
+                    return "✅ PostgreSQL ya tiene todos los lotes agregados.", None
+                avance = {"filas": 0}
+                fm.merge_chunks_to_postgresql(
+                    bloques_con_avance(store.iter_chunks(paths=pendientes), store.num_rows(pendientes),
+                                       set_progress, avance),
+                    mark=marca)
+                set_progress((100, "100%"))
+                return f"✅ {avance['filas']} filas nuevas agregadas en PostgreSQL ({len(pendientes)} lotes).", None
+
+            # Guarda en base de datos PostgreSQL, bloque por bloque (memory-map) para reportar avance.
+            fm.save_chunks_to_postgresql_copy(
+                bloques_con_avance(store.iter_chunks(), store.num_rows(), set_progress), mark=marca)
+            set_progress((100, "100%"))
             return "✅ Guardado en PostgreSQL exitosamente.", None
 
         ext = formato if formato != "xlsx" else "xlsx"
         filename = f"data_cleaned_{uuid.uuid4().hex[:6]}.{ext}"  # Genera nombre único.
         filepath = os.path.join(ARCHIVOS_GUARDADOS, filename)
 
-        fm.save_data(df_clean, filepath)            # Guarda el archivo en disco.
+        # Guarda el archivo en disco bloque por bloque, sin cargar todo el almacén.
+        fm.save_data_chunks(bloques_con_avance(store.iter_chunks(), store.num_rows(), set_progress), filepath)
+        set_progress((100, "100%"))
         return f"✅ Archivo listo para descarga: {filename}", dcc.send_file(filepath)
 
     except Exception as e:
-        return f"❌ Error al guardar: {str(e)}", None 
\ No newline at end of file
+        return f"❌ Error al guardar: {str(e)}", None
+
+def bloques_con_avance(chunks, total, set_progress, avance=None):
+    # Pasa los bloques tal cual e informa el porcentaje enviado; avance["filas"] lleva la cuenta
+    avance = avance if avance is not None else {"filas": 0}
+    total = max(total, 1)
+    for chunk in chunks:
+        yield chunk
+        avance["filas"] += len(chunk)
+        porcentaje = int(100 * min(avance["filas"], total) / total)
+        set_progress((porcentaje, f"{porcentaje}%"))
@@ -1,17 +1,11 @@
-import base64
-import io
-import uuid
-import pandas as pd
-from dash import dcc, html, dash_table, Output, Input, State
+from dash import dcc, html, dash_table, Output, Input
 import dash_bootstrap_components as dbc
 import dash
 import os
+from upload_server import TEMP_DIR, RUTA_TXT
 
 dash.register_page(__name__, path="/upload", name="Cargar Archivos")
 
-TEMP_DIR = "archivos_temporales"
-RUTA_TXT = "ruta_actual.txt"
-
 # Asegurar que las carpetas y el archivo .txt existan
 os.makedirs(TEMP_DIR, exist_ok=True)
 if not os.path.exists(RUTA_TXT):
@@ -24,16 +18,30 @@ layout = dbc.Container([
         html.Img(src="/assets/upload.png", style={"height": "35px", "align":"center", "margin-right": "20px", "justify":"center", "margin-top": "20px"}),
         html.H2("Carga de Archivos (CSV, Excel, JSON)", className="my-3")], style={"display":"flex"}),
    
-    dcc.Upload(
+    # Zona de carga: assets/stream_upload.js envía el archivo por partes a /upload/*
+    html.Div(
         id='upload-data',
         children=html.Div(['Arrastra o haz clic para subir un archivo']),
         style={
             'width': '100%', 'height': '80px', 'lineHeight': '80px',
             'borderWidth': '1px', 'borderStyle': 'dashed',
             'borderRadius': '5px', 'textAlign': 'center',
-            'margin-bottom': '20px', 'backgroundColor':  "#c9e1f8"
+            'margin-bottom': '20px', 'backgroundColor':  "#c9e1f8", 'cursor': 'pointer'
         },
-        multiple=False
+    ),
+    dbc.Progress(id='upload-progress', value=0, className="mb-3"),
+    dcc.Store(id='stream-upload-result'),
+
+    # Completo: la limpieza reemplaza los datos; incremental: solo agrega las filas nuevas del archivo
+    dbc.RadioItems(
+        id='modo-carga-selector',
+        options=[
+            {"label": "Carga completa (reemplaza los datos limpios)", "value": "completo"},
+            {"label": "Lote incremental (agrega solo las filas nuevas)", "value": "incremental"},
+        ],
+        value="completo",
+        inline=True,
+        className="mb-3",
     ),
 
     html.Div(id='output-summary'),
@@ -47,73 +55,34 @@ layout = dbc.Container([
     html.Br(),
 ], style={"background-color": "#fdf4e2"},fluid=True)
 
-# Guardar archivo subido y escribir ruta en ruta_actual.txt
-def parse_and_save_file(contents, filename):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-
-    try:
-        if filename.endswith('.csv'):
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            df = pd.read_excel(io.BytesIO(decoded))
-        elif filename.endswith('.json'):
-            df = pd.read_json(io.StringIO(decoded.decode('utf-8')))
-        else:
-            return None, None
-    except Exception as e:
-        print("❌ Error al leer archivo:", e)
-        return None, None
-
-    # Guardar como archivo temporal
-    temp_filename = f"archivo_{uuid.uuid4().hex[:6]}.csv"
-    file_path = os.path.abspath(os.path.join(TEMP_DIR, temp_filename))
-
-    try:
-        df.to_csv(file_path, index=False)
-        print(f"✅ Archivo guardado en: {file_path}")
-
-        # Guardar ruta en archivo persistente
-        with open(RUTA_TXT, "w") as f:
-            f.write(file_path)
-        print(f"📝 Ruta escrita en {RUTA_TXT}")
-
-    except Exception as e:
-        print("❌ No se pudo guardar el archivo:", e)
-        return None, None
-
-    return df, file_path
-
 @dash.callback(
     Output('output-summary', 'children'),
     Output('output-preview', 'children'),
     Output('go-to-etl', 'disabled'),
-    Input('upload-data', 'contents'),
-    State('upload-data', 'filename'),
+    Input('stream-upload-result', 'data'),
     prevent_initial_call=True
 )
-def update_output(contents, filename):
-    if contents is None or filename is None:
+def update_output(summary):
+    # El servidor ya guardó el archivo y escribió la ruta; aquí solo se muestra el resumen
+    if not summary:
         print("⚠️ No hay contenido. No se actualizará la ruta.")
         return "", "", True
 
-    df, file_path = parse_and_save_file(contents, filename)
-
-    if df is None or not os.path.exists(file_path):
+    if summary.get('error') or not os.path.exists(summary.get('file_path', '')):
         print("❌ No se pudo procesar o guardar el archivo.")
-        return html.Div("❌ Error al procesar el archivo."), "", True
+        return html.Div(f"❌ Error al procesar el archivo. {summary.get('error', '')}"), "", True
 
     resumen = html.Div([
         html.H5("✅ Archivo cargado correctamente"),
-        html.P(f"📄 Nombre original: {filename}"),
-        html.P(f"📊 Filas: {df.shape[0]}"),
-        html.P(f"📈 Columnas: {df.shape[1]}"),
-        html.P(f"🗂️ Ruta temporal: {file_path}")
+        html.P(f"📄 Nombre original: {summary['filename']}"),
+        html.P(f"📊 Filas: {summary['rows']}"),
+        html.P(f"📈 Columnas: {len(summary['columns'])}"),
+        html.P(f"🗂️ Ruta temporal: {summary['file_path']}")
     ])
 
     preview = dash_table.DataTable(
-        data=df.head(5).to_dict('records'),
-        columns=[{"name": col, "id": col} for col in df.columns],
+        data=summary['preview'],
+        columns=[{"name": col, "id": col} for col in summary['columns']],
         style_table={'overflowX': 'auto'},
         style_cell={'textAlign': 'left', 'fontSize': '14px'},
         page_size=5
@@ -121,6 +90,13 @@ def update_output(contents, filename):
 
     return resumen, preview, False
 
+@dash.callback(
+    Output("modo-carga", "data"),
+    Input("modo-carga-selector", "value"),
+)
+def elegir_modo(modo):
+    return modo
+
 # Redirigir a /etl
 @dash.callback(
     Output("url", "href"),
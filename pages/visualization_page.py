@@ -10,6 +10,14 @@ from data_analysis import (
     CustomerSegmentation,
     TemporalAnalysis
 )
+from data_store import open_store
+from model_registry import ModelRegistry, describe
+
+# Columnas que usa esta página; el resto no se lee del almacén
+GOAL_COLUMNS = [
+    'lead_time', 'adr', 'previous_bookings_not_canceled', 'required_car_parking_spaces',
+    'total_nights', 'arrival_date_year', 'arrival_date_month', 'is_canceled'
+]
 
 dash.register_page(__name__, path="/goal", name="Visualización de objetivo")
 
@@ -35,17 +43,18 @@ def mostrar_decisiones(pathname):
     if pathname != "/goal":
         return dash.no_update, dash.no_update, dash.no_update
 
-    temp_path = os.path.join("archivos_guardados", "limpio_temp.csv")
-    if not os.path.exists(temp_path):
+    store = open_store()
+    if not store.exists():
         msg = html.Div("❌ No hay datos limpios disponibles.")
         return msg, msg, msg
 
-    df = pd.read_csv(temp_path)
+    df = store.load(columns=GOAL_COLUMNS)
 
     # 1. Estimación de la duración de estancia: solo la media y la moda
     try:
-        estimator = StayLengthEstimator()
-        stay_text = estimator.train_and_report(df)
+        # Mismo modelo que en /data_mining: se carga del registro si ya se entrenó
+        estimator = StayLengthEstimator(registry=ModelRegistry(), dataset_key=store.stored_key())
+        stay_text = estimator.train_and_report(df) + describe(estimator.metadata) + "\n"
         if 'total_nights' in df.columns:
             nights_mean = df['total_nights'].mean()
             nights_mode = df['total_nights'].mode()[0] if not df['total_nights'].mode().empty else None
@@ -75,17 +84,16 @@ def mostrar_decisiones(pathname):
 
     # 2. Segmentación de clientes: solo muestra el centroide de cada cluster
     try:
-        segmentador = CustomerSegmentation(n_clusters=4)
-        df_small = df.sample(min(500, len(df)), random_state=42) if len(df) > 500 else df
-        df_cluster = segmentador.segment(df_small)
-        # Calcula centroides
-        centroids = df_cluster.groupby('cluster')[['lead_time', 'adr']].mean().reset_index()
+        segmentador = CustomerSegmentation(n_clusters='auto', registry=ModelRegistry(), dataset_key=store.stored_key())
+        segmentador.fit_chunks(lambda: store.iter_chunks(columns=segmentador.cluster_cols))
+        clusters = pd.Series(segmentador.predict_cluster(df))
+        centroids = segmentador.centers()
         fig_seg = px.scatter(
             centroids, x='lead_time', y='adr', color='cluster',
             title="Centroides de Segmentos de Clientes (lead_time vs adr)",
             labels={'lead_time': 'Lead Time', 'adr': 'ADR'}
         )
-        cluster_counts = df_cluster['cluster'].value_counts().to_dict()
+        cluster_counts = clusters[clusters >= 0].value_counts().sort_index().to_dict()
         explicacion_segment = (
             html.Div([
                 html.H4("2. Segmentación de Clientes"),
@@ -104,11 +112,10 @@ def mostrar_decisiones(pathname):
     try:
         temporal = TemporalAnalysis()
         demand_by_month = temporal.monthly_demand(df)
-        demand_by_month_sorted = demand_by_month.sort_values('year_month')
-        max_month_row = demand_by_month_sorted.loc[demand_by_month_sorted['total_reservas'].idxmax()]
+        max_month_row = demand_by_month.loc[demand_by_month['total_reservas'].idxmax()]
         # Solo muestra el mes de mayor demanda
         fig_temp = px.bar(
-            x=[max_month_row['year_month']], y=[max_month_row['total_reservas']],
+            x=[str(max_month_row['year_month'])], y=[max_month_row['total_reservas']],
             labels={'x': 'Mes', 'y': 'Total Reservas'},
             title="Mes de Mayor Demanda"
         )
@@ -116,7 +123,8 @@ def mostrar_decisiones(pathname):
             html.Div([
                 html.H4("3. Análisis de Temporalidad de la Demanda"),
                 dcc.Graph(figure=fig_temp),
-                html.P(f"**Dato clave:** El mes con mayor demanda fue: {max_month_row['year_month']} ({int(max_month_row['total_reservas'])} reservas)."),
+                html.P(f"**Dato clave:** El mes con mayor demanda fue: {max_month_row['year_month']} ({int(max_month_row['total_reservas'])} reservas, "
+                       f"{max_month_row['tasa_cancelacion']:.1%} canceladas)."),
                 html.P(
                     "Decisión: Identificar el mes pico permite ajustar precios, planificar personal y lanzar campañas de marketing."
                 )
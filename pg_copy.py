@@ -0,0 +1,197 @@
+import io
+import numpy as np
+import pandas as pd
+
+# Filas serializadas por bloque: la memoria usada no depende del tamaño del DataFrame
+COPY_BLOCK_ROWS = 10_000
+COPY_BUFFER_BYTES = 64 * 1024
+
+NULL_TEXT = "\\N"
+NULL_BINARY = b"\xff\xff\xff\xff"
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + (0).to_bytes(4, "big") + (0).to_bytes(4, "big")
+BINARY_TRAILER = (-1).to_bytes(2, "big", signed=True)
+
+# Formato binario de cada tipo, alineado con el mapeo de FileManager.create_table_from_df
+# (int8 → SMALLINT, float32 → REAL, ...); ver binary_format
+BINARY_FORMATS = {
+    'int8': '>i2',
+    'int16': '>i2',
+    'int32': '>i4',
+    'int64': '>i8',
+    'float32': '>f4',
+    'float64': '>f8',
+    'bool': '>u1',
+}
+PG_EPOCH = np.datetime64("2000-01-01T00:00:00", "us")
+
+
+class CopyStream(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre un generador de bytes, para pasarlo a
+    cursor.copy_expert: cada bloque se serializa cuando PostgreSQL lo pide.
+    """
+    def __init__(self, parts):
+        self._parts = iter(parts)
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not len(self._buffer):
+            try:
+                self._buffer = memoryview(next(self._parts))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _escape_text(values: pd.Series) -> np.ndarray:
+    # Formato de texto de COPY: la barra invertida, tabuladores y saltos de línea se escapan
+    escaped = (values.astype(str)
+               .str.replace("\\", "\\\\", regex=False)
+               .str.replace("\t", "\\t", regex=False)
+               .str.replace("\n", "\\n", regex=False)
+               .str.replace("\r", "\\r", regex=False))
+    return escaped.to_numpy(dtype=object)
+
+
+def _format_text(s: pd.Series) -> np.ndarray:
+    # Valores sin nulos a su representación de texto para PostgreSQL
+    dtype = s.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return np.where(s.to_numpy(dtype=bool), "t", "f").astype(object)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return s.dt.strftime("%Y-%m-%d %H:%M:%S.%f").to_numpy(dtype=object)
+    if pd.api.types.is_float_dtype(dtype):
+        return s.astype(str).replace({"inf": "Infinity", "-inf": "-Infinity"}).to_numpy(dtype=object)
+    if pd.api.types.is_numeric_dtype(dtype):
+        return s.astype(str).to_numpy(dtype=object)
+    return _escape_text(s)
+
+
+def _codes_and_uniques(s: pd.Series):
+    # Cada valor distinto se formatea una sola vez; el código -1 marca los nulos
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), pd.Series(s.cat.categories)
+    codes, uniques = pd.factorize(s)
+    return codes, pd.Series(uniques)
+
+
+def _text_values(s: pd.Series) -> np.ndarray:
+    codes, uniques = _codes_and_uniques(s)
+    # TEXT y ENUM: la etiqueta tal como la crea create_table_from_df (str de cada valor)
+    formatted = _escape_text(uniques.astype(object)) if binary_format(s.dtype) == 'text' else _format_text(uniques)
+    return np.append(formatted, NULL_TEXT)[codes]
+
+
+def iter_copy_text(df: pd.DataFrame, block_rows: int = COPY_BLOCK_ROWS):
+    """
+    Bytes en el formato de texto de COPY (columnas separadas por tabulador y \\N
+    para los nulos), un bloque de filas a la vez.
+    """
+    for start in range(0, len(df), block_rows):
+        block = df.iloc[start:start + block_rows]
+        lines = None
+        for col in block.columns:
+            values = _text_values(block[col])
+            lines = values if lines is None else lines + "\t" + values
+        if lines is not None and len(lines):
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _binary_fixed(values: np.ndarray, fmt: str) -> np.ndarray:
+    # Longitud + valor en big-endian, un fragmento de bytes por fila
+    width = np.dtype(fmt).itemsize
+    fields = np.empty(len(values), dtype=[('length', '>i4'), ('value', fmt)])
+    fields['length'] = width
+    fields['value'] = values
+    raw = fields.tobytes()
+    step = 4 + width
+    return np.array([raw[i:i + step] for i in range(0, len(raw), step)], dtype=object)
+
+
+def _binary_text(values) -> np.ndarray:
+    encoded = [str(value).encode("utf-8") for value in values]
+    return np.array([len(value).to_bytes(4, "big") + value for value in encoded], dtype=object)
+
+
+def binary_format(dtype):
+    """
+    Formato binario de COPY para un tipo de pandas, según la columna que crea
+    FileManager.create_table_from_df: 'timestamp', 'text' (TEXT y ENUM) o un
+    formato de numpy. None si el tipo no tiene un formato binario equivalente
+    (p. ej. Int64 o boolean nullable, fechas con zona horaria).
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = dtype.categories.dtype
+        if not pd.api.types.is_numeric_dtype(categories):
+            return 'text'
+        return BINARY_FORMATS.get(str(categories))
+    if isinstance(dtype, np.dtype) and dtype.kind == 'M':
+        return 'timestamp'
+    if dtype == object or isinstance(dtype, pd.StringDtype):
+        return 'text'
+    return BINARY_FORMATS.get(str(dtype))
+
+
+def binary_supported(df: pd.DataFrame) -> bool:
+    return all(binary_format(dtype) is not None for dtype in df.dtypes)
+
+
+def _format_binary(s: pd.Series, fmt: str) -> np.ndarray:
+    # Valores sin nulos a su representación binaria (longitud + valor)
+    if fmt == 'timestamp':
+        # timestamp: microsegundos desde 2000-01-01
+        micros = (s.to_numpy(dtype="datetime64[us]") - PG_EPOCH).astype("int64")
+        return _binary_fixed(micros, '>i8')
+    if fmt == 'text':
+        # TEXT y ENUM se envían con la etiqueta en UTF-8
+        return _binary_text(s.to_numpy(dtype=object))
+    return _binary_fixed(s.to_numpy().astype(fmt), fmt)
+
+
+def _binary_values(s: pd.Series, fmt: str) -> np.ndarray:
+    codes, uniques = _codes_and_uniques(s)
+    return np.append(_format_binary(uniques, fmt), NULL_BINARY)[codes]
+
+
+def iter_copy_binary(df: pd.DataFrame, block_rows: int = COPY_BLOCK_ROWS):
+    """
+    Bytes en el formato binario de COPY. Los tipos deben coincidir con los de la
+    tabla destino (la creada por FileManager.create_table_from_df); si alguna
+    columna no tiene formato binario (ver binary_format) se lanza ValueError.
+    """
+    formats = {col: binary_format(dtype) for col, dtype in df.dtypes.items()}
+    unsupported = [col for col, fmt in formats.items() if fmt is None]
+    if unsupported:
+        raise ValueError(f"Columnas sin formato binario de COPY: {unsupported}")
+    yield BINARY_HEADER
+    field_count = len(df.columns).to_bytes(2, "big")
+    for start in range(0, len(df), block_rows):
+        block = df.iloc[start:start + block_rows]
+        rows = np.full(len(block), field_count, dtype=object)
+        for col in block.columns:
+            rows = rows + _binary_values(block[col], formats[col])
+        yield b"".join(rows)
+    yield BINARY_TRAILER
+
+
+def copy_dataframe(cursor, df: pd.DataFrame, table_name: str, binary: bool = False):
+    """
+    Envía df a table_name con COPY ... FROM STDIN sin armar el texto completo en
+    memoria: el flujo se genera bloque por bloque mientras el servidor lo lee.
+    Si algún tipo no tiene formato binario, todo el DataFrame se envía como texto.
+    """
+    binary = binary and binary_supported(df)
+    columns_sql = ", ".join(f'"{col}"' for col in df.columns)
+    if binary:
+        sql = f'COPY "{table_name}" ({columns_sql}) FROM STDIN WITH (FORMAT binary)'
+        stream = CopyStream(iter_copy_binary(df))
+    else:
+        sql = f'COPY "{table_name}" ({columns_sql}) FROM STDIN'
+        stream = CopyStream(iter_copy_text(df))
+    cursor.copy_expert(sql, stream, size=COPY_BUFFER_BYTES)
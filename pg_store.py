@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import uuid
+import pandas as pd
+import psycopg2
+from db_pool import db_pool
+from file_manager import CONTROL_TABLE
+
+READ_TABLE = os.environ.get("PG_READ_TABLE", "datos_limpios")
+FILTER_OPERATORS = {'=', '!=', '<', '<=', '>', '>=', 'in', 'between'}
+
+# Tipo de pandas para cada tipo de PostgreSQL (los ENUM se leen como categóricos)
+PANDAS_TYPES = {
+    'smallint': 'int16',
+    'integer': 'int32',
+    'bigint': 'int64',
+    'real': 'float32',
+    'double precision': 'float64',
+    'numeric': 'float64',
+    'boolean': 'bool',
+}
+
+
+class PostgresStore:
+    """
+    Lectura de la tabla limpia en PostgreSQL con la misma interfaz que DataStore
+    (exists, columns, stored_key, head, iter_chunks, load), para que las páginas
+    de análisis trabajen sobre la base sin traer la tabla completa.
+
+    Solo se piden las columnas solicitadas, los filtros se aplican en el servidor
+    (WHERE) y los bloques llegan por un cursor con nombre (del lado del servidor),
+    así el cliente tiene a lo más un bloque en memoria. Los filtros son tuplas
+    (columna, operador, valor), p. ej. ('hotel', '=', 'Resort Hotel') o
+    ('reservation_status_date', 'between', ['2016-01-01', '2016-12-31']).
+    """
+    def __init__(self, table_name: str = READ_TABLE, filters: list = None, pool=None):
+        self.table_name = table_name
+        self.filters = [tuple(f) for f in (filters or [])]
+        self.pool = pool or db_pool
+        self._types = None
+
+    @classmethod
+    def from_env(cls):
+        # PG_READ_FILTERS: lista JSON de [columna, operador, valor]
+        return cls(filters=json.loads(os.environ.get("PG_READ_FILTERS", "[]")))
+
+    def exists(self) -> bool:
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT to_regclass(%s);", (f'"{self.table_name}"',))
+                found = cursor.fetchone()[0] is not None
+                conn.rollback()
+            return found
+        except psycopg2.Error:
+            return False
+
+    def _column_types(self) -> dict:
+        # {columna: tipo de pandas}, en el orden de la tabla; los ENUM con sus etiquetas en orden
+        if self._types is None:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT column_name, data_type, udt_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position;",
+                    (self.table_name,))
+                columns = cursor.fetchall()
+                enums = {}
+                for name, data_type, udt_name in columns:
+                    if data_type == 'USER-DEFINED':
+                        cursor.execute(
+                            "SELECT enumlabel FROM pg_enum WHERE enumtypid = %s::regtype ORDER BY enumsortorder;",
+                            (f'"{udt_name}"',))
+                        enums[name] = pd.CategoricalDtype([row[0] for row in cursor.fetchall()])
+                conn.rollback()
+            self._types = {
+                name: enums[name] if name in enums else (
+                    'datetime64[ns]' if data_type.startswith('timestamp') else PANDAS_TYPES.get(data_type, 'object'))
+                for name, data_type, _ in columns
+            }
+        return self._types
+
+    def columns(self) -> list:
+        return list(self._column_types()) if self.exists() else []
+
+    def stored_key(self):
+        """
+        Llave de la versión leída: cambia si la tabla se reemplaza (nuevo oid tras
+        el intercambio de una recarga completa), con cada carga de FileManager (que
+        aumenta la versión en CONTROL_TABLE en la misma transacción) o si cambian
+        los filtros. Las escrituras hechas por fuera de FileManager no la cambian.
+        """
+        if not self.exists():
+            return None
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT %s::regclass::oid, to_regclass(%s);",
+                           (f'"{self.table_name}"', f'"{CONTROL_TABLE}"'))
+            oid, control = cursor.fetchone()
+            version = 0
+            if control is not None:
+                cursor.execute(f'SELECT version FROM "{CONTROL_TABLE}" WHERE tabla = %s;', (self.table_name,))
+                row = cursor.fetchone()
+                version = row[0] if row else 0
+            conn.rollback()
+        key = json.dumps([self.table_name, oid, int(version), self.filters], default=str)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest(), "postgresql"
+
+    def _query(self, columns=None, limit: int = None):
+        types = self._column_types()
+        columns = list(types) if columns is None else [col for col in columns if col in types]
+        conditions, params = [], []
+        for col, op, value in self.filters:
+            op = op.lower()
+            if col not in types or op not in FILTER_OPERATORS:
+                raise ValueError(f"Filtro no válido: {(col, op, value)}")
+            # Los ENUM se comparan como texto (los parámetros llegan como texto)
+            target = f'"{col}"::text' if isinstance(types[col], pd.CategoricalDtype) else f'"{col}"'
+            if op == 'in':
+                conditions.append(f'{target} = ANY(%s)')
+                params.append(list(value))
+            elif op == 'between':
+                conditions.append(f'{target} BETWEEN %s AND %s')
+                params.extend(value)
+            else:
+                conditions.append(f'{target} {op} %s')
+                params.append(value)
+        # Los ENUM se piden como texto para que el cliente no dependa de su OID
+        select = ", ".join(f'"{col}"::text' if isinstance(types[col], pd.CategoricalDtype) else f'"{col}"'
+                           for col in columns)
+        sql = f'SELECT {select} FROM "{self.table_name}"'
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return columns, sql, params
+
+    def _to_frame(self, rows: list, columns: list) -> pd.DataFrame:
+        # Tipos fijos por columna: todos los bloques coinciden aunque alguno no tenga nulos
+        types = self._column_types()
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        for col in columns:
+            dtype = types[col]
+            if isinstance(dtype, pd.CategoricalDtype) or dtype in ('object', 'datetime64[ns]'):
+                df[col] = df[col].astype(dtype)
+            elif dtype == 'bool':
+                df[col] = df[col].astype('bool' if df[col].notna().all() else 'object')
+            else:
+                values = pd.to_numeric(df[col], errors='coerce')
+                # Enteros con nulos como float64, igual que pandas al leer un CSV
+                if values.isna().any() and not pd.api.types.is_float_dtype(dtype):
+                    dtype = 'float64'
+                df[col] = values.astype(dtype)
+        return df
+
+    def iter_chunks(self, columns=None, chunksize: int = 100_000):
+        columns, sql, params = self._query(columns)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(name=f"lector_{uuid.uuid4().hex[:8]}")
+            cursor.itersize = chunksize
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    yield self._to_frame(rows, columns)
+            finally:
+                # También si el consumidor deja de pedir bloques: la conexión vuelve limpia al pool
+                # (el cursor con nombre se cierra antes de terminar la transacción que lo contiene)
+                cursor.close()
+                conn.rollback()
+
+    def head(self, n: int = 100) -> pd.DataFrame:
+        columns, sql, params = self._query(limit=n)
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            conn.rollback()
+        return self._to_frame(rows, columns)
+
+    def load(self, columns=None) -> pd.DataFrame:
+        columns = self._query(columns)[0]
+        chunks = list(self.iter_chunks(columns=columns))
+        return pd.concat(chunks, ignore_index=True) if chunks else self._to_frame([], columns)
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objs as go
+
+# Máximo de puntos que se envían al navegador por gráfica (PLOT_POINT_BUDGET)
+POINT_BUDGET = int(os.environ.get("PLOT_POINT_BUDGET", 5000))
+GRID_BINS = 64
+
+
+def _cell_cap(counts: np.ndarray, budget: int) -> int:
+    # Mayor tope por celda tal que sum(min(conteo, tope)) no pase del presupuesto
+    low, high = 1, int(counts.max())
+    while low < high:
+        mid = (low + high + 1) // 2
+        if np.minimum(counts, mid).sum() <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, budget: int = None, bins: int = GRID_BINS) -> pd.DataFrame:
+    """
+    Reduce df a lo más `budget` filas conservando la forma de la nube: divide el
+    plano x-y en una rejilla y toma hasta el mismo número de puntos de cada celda,
+    así las zonas poco pobladas y los valores extremos siguen apareciendo.
+    """
+    budget = budget or POINT_BUDGET
+    df = df.dropna(subset=[x, y])
+    if len(df) <= budget:
+        return df
+
+    cells = np.zeros(len(df), dtype=np.int64)
+    for col in (x, y):
+        values = df[col].to_numpy(dtype='float64')
+        edges = np.linspace(values.min(), values.max(), bins + 1)
+        cells = cells * bins + np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+
+    # Orden aleatorio dentro de cada celda y corte al tope común
+    order = np.random.default_rng(42).permutation(len(df))
+    shuffled = pd.Series(cells[order])
+    rank = shuffled.groupby(shuffled).cumcount().to_numpy()
+    cap = _cell_cap(np.bincount(cells), budget)
+    keep = np.sort(order[rank < cap])
+    return df.iloc[keep]
+
+
+def density_figure(df: pd.DataFrame, x: str, y: str, title: str = "", bins: int = GRID_BINS) -> go.Figure:
+    # Histograma 2D calculado en el servidor: el tamaño no depende del número de filas
+    data = df[[x, y]].dropna().to_numpy(dtype='float64')
+    counts, x_edges, y_edges = np.histogram2d(data[:, 0], data[:, 1], bins=bins)
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=np.where(counts.T > 0, counts.T, np.nan), colorscale="Viridis", colorbar={'title': 'filas'}))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def scatter_figure(df: pd.DataFrame, x: str, y: str, color: str = None, title: str = "",
+                   budget: int = None, mode: str = "sample") -> go.Figure:
+    """
+    Scatter acotado para datasets grandes. mode="sample" dibuja con WebGL una muestra
+    por rejilla de a lo más `budget` puntos; mode="density" dibuja un histograma 2D
+    con todas las filas.
+    """
+    if mode == "density":
+        return density_figure(df, x, y, title=title)
+
+    total = int(df[[x, y]].notna().all(axis=1).sum())
+    sample = downsample(df, x, y, budget)
+    if len(sample) < total:
+        title = f"{title} (muestra de {len(sample)} de {total} puntos)"
+    return px.scatter(sample, x=x, y=y, color=color, title=title, render_mode="webgl")
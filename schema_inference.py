@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+BOOL_VALUES = {
+    'true': True, 'false': False, 'yes': True, 'no': False,
+    'si': True, 'sí': True, 't': True, 'f': False,
+}
+
+
+def downcast_numeric(series: pd.Series) -> pd.Series:
+    """
+    Reduce una columna numérica al tipo más pequeño que conserve sus valores
+    exactos: enteros a int8/int16/int32 y flotantes a float32 solo si cada valor
+    (incluidos los NaN) se recupera idéntico al volver a float64. Una columna como
+    0.1, 107.42 no es exacta en float32 y se queda en float64.
+    """
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+
+    values = series.to_numpy(dtype='float64')
+    finite = values[np.isfinite(values)]
+    if len(finite) == len(values) and len(values) and np.array_equal(finite, np.round(finite)):
+        # Flotantes sin nulos y sin decimales: se guardan como enteros
+        return pd.to_numeric(series.astype('int64'), downcast='integer')
+    as_float32 = values.astype('float32')
+    if np.array_equal(as_float32.astype('float64'), values, equal_nan=True):
+        return pd.Series(as_float32, index=series.index, name=series.name)
+    return series
+
+
+class SchemaInference:
+    """
+    Infiere el tipo destino de cada columna de texto (int, float, bool, date,
+    category o string) a partir de una muestra, con un nivel de confianza igual a
+    la fracción de valores de la muestra que se pudieron convertir. Solo se
+    convierten las columnas que califican, una vez cada una.
+    """
+    def __init__(self, sample_size: int = 1000, max_categories: int = 1000,
+                 category_ratio: float = 0.5, random_state: int = 42):
+        self.sample_size = sample_size
+        self.max_categories = max_categories
+        self.category_ratio = category_ratio
+        self.random_state = random_state
+
+    def _sample(self, series: pd.Series) -> pd.Series:
+        values = series.dropna()
+        if len(values) > self.sample_size:
+            values = values.sample(self.sample_size, random_state=self.random_state)
+        return values
+
+    def infer_column(self, series: pd.Series) -> dict:
+        sample = self._sample(series)
+        if sample.empty:
+            return {'dtype': 'string', 'confidence': 0.0}
+        text = sample.astype(str).str.strip()
+
+        numbers = pd.to_numeric(text, errors='coerce')
+        confidence = numbers.notna().mean()
+        if confidence == 1.0:
+            dtype = 'int' if np.array_equal(numbers, np.round(numbers)) else 'float'
+            return {'dtype': dtype, 'confidence': 1.0}
+
+        lowered = text.str.lower()
+        bool_confidence = lowered.isin(BOOL_VALUES.keys()).mean()
+        if bool_confidence == 1.0:
+            return {'dtype': 'bool', 'confidence': 1.0}
+
+        # Solo se intenta fecha si el texto tiene forma de fecha (evita parsear textos libres)
+        if text.str.match(r'^\d{1,4}[-/]\d{1,2}[-/]\d{1,4}').mean() == 1.0:
+            dates = pd.to_datetime(text, errors='coerce')
+            date_confidence = dates.notna().mean()
+            if date_confidence == 1.0:
+                return {'dtype': 'date', 'confidence': 1.0}
+
+        unique_ratio = sample.nunique() / len(sample)
+        if unique_ratio <= self.category_ratio and series.nunique() <= self.max_categories:
+            return {'dtype': 'category', 'confidence': 1.0 - unique_ratio}
+        return {'dtype': 'string', 'confidence': max(confidence, bool_confidence)}
+
+    def infer(self, df: pd.DataFrame) -> dict:
+        return {
+            col: self.infer_column(df[col])
+            for col in df.columns
+            if df[col].dtype == 'object' or pd.api.types.is_string_dtype(df[col].dtype)
+        }
+
+    def convert_column(self, series: pd.Series, dtype: str) -> pd.Series:
+        """
+        Convierte la columna completa al tipo inferido. Si la muestra no era
+        representativa y algún valor no se puede convertir, se conserva la original.
+        """
+        if dtype in ['int', 'float']:
+            converted = pd.to_numeric(series, errors='coerce')
+        elif dtype == 'bool':
+            converted = series.astype(str).str.strip().str.lower().map(BOOL_VALUES).where(series.notna())
+            if converted.notna().sum() == series.notna().sum():
+                return converted.astype('boolean') if series.isna().any() else converted.astype(bool)
+        elif dtype == 'date':
+            converted = pd.to_datetime(series, errors='coerce')
+        elif dtype == 'category':
+            return series.astype('category')
+        else:
+            return series
+
+        if converted.notna().sum() != series.notna().sum():
+            return series
+        return converted
+
+    def apply(self, df: pd.DataFrame, schema: dict = None, categorical: bool = True) -> pd.DataFrame:
+        schema = self.infer(df) if schema is None else schema
+        for col, info in schema.items():
+            if col in df.columns and (categorical or info['dtype'] != 'category'):
+                df[col] = self.convert_column(df[col], info['dtype'])
+        return df
+
+    def compact(self, df: pd.DataFrame) -> dict:
+        """
+        Reduce la memoria del DataFrame (en el mismo objeto): numéricos al tipo más
+        pequeño y textos de baja cardinalidad a categóricos. Devuelve, por columna,
+        el tipo y los bytes antes y después.
+        """
+        report = {}
+        text_schema = self.infer(df)
+        for col in df.columns:
+            before_dtype = str(df[col].dtype)
+            before_bytes = int(df[col].memory_usage(index=False, deep=True))
+            if col in text_schema:
+                if text_schema[col]['dtype'] == 'category':
+                    df[col] = df[col].astype('category')
+            else:
+                df[col] = downcast_numeric(df[col])
+            report[col] = {
+                'dtype_before': before_dtype,
+                'dtype_after': str(df[col].dtype),
+                'bytes_before': before_bytes,
+                'bytes_after': int(df[col].memory_usage(index=False, deep=True)),
+            }
+        return report
+
+    def conform(self, df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+        """
+        Convierte df (en el mismo objeto) a los tipos de una tabla ya guardada, p. ej.
+        un lote incremental a los del almacén, para que ninguna columna cambie de tipo
+        entre cargas. Si algún valor no cabe en el tipo destino se lanza ValueError.
+        """
+        for col, dtype in dtypes.items():
+            if col not in df.columns or df[col].dtype == dtype:
+                continue
+            series = df[col]
+            if isinstance(dtype, pd.CategoricalDtype):
+                if not pd.api.types.is_numeric_dtype(dtype.categories.dtype):
+                    series = series.where(series.isna(), series.astype(str))
+                # Con las categorías del destino si las contiene todas (mismo diccionario en cada bloque)
+                known = len(dtype.categories) and series.dropna().isin(dtype.categories).all()
+                df[col] = series.astype(dtype if known else 'category')
+                continue
+            if pd.api.types.is_bool_dtype(dtype):
+                converted = self.convert_column(series, 'bool')
+            elif pd.api.types.is_numeric_dtype(dtype):
+                converted = pd.to_numeric(series, errors='coerce')
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                converted = pd.to_datetime(series, errors='coerce')
+            else:
+                df[col] = series.astype(dtype)
+                continue
+
+            if converted.notna().sum() != series.notna().sum() or converted.dtype == object:
+                raise ValueError(f"La columna '{col}' tiene valores que no se pueden convertir a {dtype}.")
+            if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+                if converted.isna().any():
+                    raise ValueError(f"La columna '{col}' tiene nulos y en la tabla guardada es {dtype}.")
+            if pd.api.types.is_integer_dtype(dtype) and len(converted):
+                values = converted.to_numpy(dtype='float64')
+                info = np.iinfo(dtype)
+                if values.min() < info.min or values.max() > info.max or not np.array_equal(values, np.round(values)):
+                    raise ValueError(f"La columna '{col}' tiene valores fuera del rango de {dtype}.")
+            df[col] = converted.astype(dtype)
+        return df
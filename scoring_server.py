@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from flask import request, jsonify
+from data_analysis import CancellationPredictor, StayLengthEstimator, load_registered
+from data_store import DataStore
+from model_registry import ModelRegistry
+
+LATENCY_WINDOW = 10_000
+MAX_BATCH = 1000
+
+
+class OnlineScorer:
+    """
+    Mantiene en memoria los modelos de cancelación y de duración de estancia para
+    responder predicciones de reservas individuales o en lotes pequeños. Los
+    modelos se toman del registro al iniciar y con reload() (POST /score/reload),
+    nunca dentro de una solicitud: /score no lee el almacén ni entrena, así las
+    latencias p50/p99 que guarda son solo de la predicción. Si el dataset limpio
+    no tiene modelos registrados (se entrenan en Minería de datos o con
+    batch_scoring) las solicitudes responden 503.
+    """
+    def __init__(self, store: DataStore = None, registry: ModelRegistry = None):
+        self.store = store or DataStore()
+        self.registry = registry or ModelRegistry()
+        self.dataset_key = None
+        self.models = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """
+        Toma del registro los modelos del dataset limpio vigente. Si falta alguno se
+        lanza LookupError y se conservan los modelos anteriores.
+        """
+        with self._lock:
+            dataset_key = self.store.stored_key()
+            if dataset_key is None:
+                raise LookupError("No hay datos limpios con modelos registrados.")
+            cancellation = CancellationPredictor(registry=self.registry, dataset_key=dataset_key)
+            stay = StayLengthEstimator(registry=self.registry, dataset_key=dataset_key)
+            missing = [type(model).__name__ for model in (cancellation, stay) if not load_registered(model)]
+            if missing:
+                raise LookupError(f"Sin modelos registrados para los datos limpios actuales: {missing}. "
+                                  "Entrénelos en Minería de datos o con batch_scoring.")
+            # Un solo cambio de referencia: una solicitud en curso usa el par anterior completo
+            self.models, self.dataset_key = (cancellation, stay), dataset_key
+        return dataset_key
+
+    def score(self, reservations: list) -> list:
+        start = time.perf_counter()
+        models = self.models
+        if models is None:
+            raise LookupError("Los modelos no están cargados; use POST /score/reload tras entrenarlos.")
+        cancellation, stay = models
+        df = pd.DataFrame.from_records(reservations)
+        if 'total_nights' not in df.columns and {'stays_in_weekend_nights', 'stays_in_week_nights'} <= set(df.columns):
+            df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
+
+        probabilities = cancellation.predict_proba(df)
+        nights = stay.predict(df)
+        results = [
+            {
+                'cancel_probability': None if np.isnan(p) else float(p),
+                'estimated_nights': None if np.isnan(n) else float(n),
+            }
+            for p, n in zip(probabilities, nights)
+        ]
+        self.latencies.append(time.perf_counter() - start)
+        return results
+
+    def metrics(self) -> dict:
+        latencies_ms = np.array(self.latencies) * 1000
+        if not len(latencies_ms):
+            return {'requests': 0, 'p50_ms': None, 'p99_ms': None}
+        return {
+            'requests': int(len(latencies_ms)),
+            'p50_ms': float(np.percentile(latencies_ms, 50)),
+            'p99_ms': float(np.percentile(latencies_ms, 99)),
+            'dataset_key': "|".join(self.dataset_key) if self.dataset_key else None,
+        }
+
+
+def register_scoring_routes(server, scorer: OnlineScorer = None):
+    """
+    POST /score acepta una reserva (objeto JSON) o una lista de reservas y devuelve
+    la probabilidad de cancelación y la estancia estimada de cada una.
+    GET /score/metrics devuelve las latencias p50/p99 de las últimas solicitudes.
+    POST /score/reload vuelve a tomar del registro los modelos del dataset vigente.
+    """
+    scorer = scorer or OnlineScorer()
+    try:
+        scorer.reload()
+    except LookupError as e:
+        print(f"⚠️ Puntuación en línea sin modelos: {e}")
+
+    @server.route("/score", methods=["POST"])
+    def score_reservations():
+        payload = request.get_json(silent=True)
+        single = isinstance(payload, dict)
+        reservations = [payload] if single else payload
+        if not isinstance(reservations, list) or not reservations:
+            return jsonify(error="Envíe una reserva (objeto JSON) o una lista de reservas."), 400
+        if len(reservations) > MAX_BATCH:
+            return jsonify(error=f"Máximo {MAX_BATCH} reservas por solicitud."), 400
+
+        try:
+            results = scorer.score(reservations)
+        except LookupError as e:
+            return jsonify(error=str(e)), 503
+        except (ValueError, TypeError) as e:
+            return jsonify(error=f"Reserva inválida: {e}"), 400
+        return jsonify(results[0] if single else results)
+
+    @server.route("/score/reload", methods=["POST"])
+    def score_reload():
+        try:
+            dataset_key = scorer.reload()
+        except LookupError as e:
+            return jsonify(error=str(e)), 503
+        return jsonify(dataset_key="|".join(dataset_key))
+
+    @server.route("/score/metrics", methods=["GET"])
+    def score_metrics():
+        return jsonify(scorer.metrics())
+
+    return scorer
@@ -0,0 +1,153 @@
+import os
+import re
+import threading
+import uuid
+import pandas as pd
+from flask import request, jsonify
+from dataset_cache import dataset_cache, file_fingerprint
+
+TEMP_DIR = "archivos_temporales"
+RUTA_TXT = "ruta_actual.txt"
+READ_BLOCK = 1024 * 1024
+SUPPORTED_EXTENSIONS = ['.csv', '.xlsx', '.xls', '.json']
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Un candado por carga: la revisión del desplazamiento y la escritura van juntas
+_upload_locks = {}
+_upload_locks_guard = threading.Lock()
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(TEMP_DIR, f"{upload_id}.part")
+
+
+def _meta_path(upload_id: str) -> str:
+    return os.path.join(TEMP_DIR, f"{upload_id}.name")
+
+
+def _upload_lock(upload_id: str) -> threading.Lock:
+    with _upload_locks_guard:
+        return _upload_locks.setdefault(upload_id, threading.Lock())
+
+
+def _received(upload_id: str) -> int:
+    path = _part_path(upload_id)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def convert_to_csv(path: str, extension: str, chunksize: int = 100_000) -> str:
+    """
+    Deja el archivo subido como CSV, que es lo que lee la limpieza (incluido el modo
+    por bloques). Los CSV se usan tal cual; JSON por líneas se convierte por
+    bloques; Excel y JSON normal se tienen que leer completos.
+    """
+    if extension == '.csv':
+        return path
+    csv_path = os.path.splitext(path)[0] + ".csv"
+    if extension == '.json':
+        try:
+            reader = pd.read_json(path, lines=True, chunksize=chunksize)
+            for i, chunk in enumerate(reader):
+                chunk.to_csv(csv_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            return csv_path
+        except ValueError:
+            df = pd.read_json(path)
+    else:
+        df = pd.read_excel(path)
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
+
+def summarize_csv(path: str, preview_rows: int = 5, chunksize: int = 100_000) -> dict:
+    # Se cuentan filas por bloques leyendo solo la primera columna
+    preview = pd.read_csv(path, nrows=preview_rows)
+    rows = 0
+    for chunk in pd.read_csv(path, usecols=[0], chunksize=chunksize):
+        rows += len(chunk)
+    return {
+        'rows': rows,
+        'columns': list(preview.columns),
+        'preview': preview.astype(object).where(preview.notna(), None).to_dict('records'),
+    }
+
+
+def register_upload_routes(server):
+    """
+    Rutas de carga por partes sobre el servidor Flask de Dash. El cliente inicia
+    la carga, envía bloques con su desplazamiento (reanudable consultando cuántos
+    bytes ya se recibieron) y al completar recibe solo un resumen y una vista previa.
+    """
+    os.makedirs(TEMP_DIR, exist_ok=True)
+
+    @server.route("/upload/init", methods=["POST"])
+    def upload_init():
+        payload = request.get_json(silent=True) or {}
+        filename = os.path.basename(payload.get('filename', ''))
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            return jsonify(error="Formato no soportado. Use CSV, Excel o JSON."), 400
+
+        upload_id = payload.get('upload_id') or uuid.uuid4().hex
+        if not UPLOAD_ID.match(upload_id):
+            return jsonify(error="Identificador de carga inválido."), 400
+        with open(_meta_path(upload_id), "w", encoding="utf-8") as f:
+            f.write(filename)
+        return jsonify(upload_id=upload_id, received=_received(upload_id))
+
+    @server.route("/upload/<upload_id>", methods=["GET"])
+    def upload_status(upload_id):
+        if not UPLOAD_ID.match(upload_id):
+            return jsonify(error="Identificador de carga inválido."), 400
+        return jsonify(upload_id=upload_id, received=_received(upload_id))
+
+    @server.route("/upload/<upload_id>", methods=["PUT"])
+    def upload_chunk(upload_id):
+        if not UPLOAD_ID.match(upload_id) or not os.path.exists(_meta_path(upload_id)):
+            return jsonify(error="Carga desconocida."), 404
+        offset = request.args.get('offset', type=int, default=0)
+        # Un reintento que se cruza con una petición en curso espera y recibe 409
+        # (con el tamaño ya actualizado) en lugar de agregar el mismo bloque dos veces
+        with _upload_lock(upload_id):
+            received = _received(upload_id)
+            if offset != received:
+                # El cliente debe continuar desde lo que ya está en disco
+                return jsonify(error="Desplazamiento incorrecto.", received=received), 409
+
+            with open(_part_path(upload_id), "ab") as f:
+                while True:
+                    block = request.stream.read(READ_BLOCK)
+                    if not block:
+                        break
+                    f.write(block)
+            return jsonify(upload_id=upload_id, received=_received(upload_id))
+
+    @server.route("/upload/<upload_id>/complete", methods=["POST"])
+    def upload_complete(upload_id):
+        if not UPLOAD_ID.match(upload_id) or not os.path.exists(_meta_path(upload_id)):
+            return jsonify(error="Carga desconocida."), 404
+        with open(_meta_path(upload_id), "r", encoding="utf-8") as f:
+            filename = f.read().strip()
+        extension = os.path.splitext(filename)[1].lower()
+
+        try:
+            file_path = os.path.abspath(os.path.join(TEMP_DIR, f"archivo_{upload_id[:6]}{extension}"))
+            # Sin bloques escribiéndose a la mitad mientras se mueve el archivo
+            with _upload_lock(upload_id):
+                os.replace(_part_path(upload_id), file_path)
+                os.remove(_meta_path(upload_id))
+            with _upload_locks_guard:
+                _upload_locks.pop(upload_id, None)
+            file_path = convert_to_csv(file_path, extension)
+            summary = summarize_csv(file_path)
+        except Exception as e:
+            print("❌ Error al procesar archivo:", e)
+            return jsonify(error=f"Error al procesar el archivo: {e}"), 400
+
+        # Nuevo archivo: se invalida la caché y se guarda la ruta para la limpieza
+        dataset_cache.start_dataset(file_fingerprint(file_path))
+        with open(RUTA_TXT, "w") as f:
+            f.write(file_path)
+        print(f"✅ Archivo guardado en: {file_path}")
+
+        summary.update(filename=filename, file_path=file_path)
+        return jsonify(summary)
@@ -0,0 +1,142 @@
+"""
+Verificación de las cargas a PostgreSQL de FileManager contra una base real:
+recarga completa, intercambio de tablas, upsert sin duplicados y creación de
+particiones. Solo corre si PG_DSN está definido; usa tablas propias
+(prueba_etl_<id>) y las elimina al terminar.
+
+    PG_DSN="host=localhost dbname=hotel_pob user=postgres" python verificar_postgresql.py
+"""
+import os
+import sys
+import uuid
+import numpy as np
+import pandas as pd
+
+MESES = ['January', 'July', 'August']
+
+
+def datos_prueba(n: int, inicio: int = 0, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(inicio, inicio + n, dtype='int32'),
+        'hotel': pd.Categorical(rng.choice(['City Hotel', 'Resort Hotel'], n)),
+        'arrival_date_year': rng.choice([2015, 2016, 2017], n).astype('int16'),
+        'arrival_date_month': pd.Categorical(rng.choice(MESES, n)),
+        'adr': rng.uniform(0, 300, n).astype('float32'),
+        'reservation_status_date': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 700, n), 'D'),
+    })
+
+
+def consulta(fm, sql: str, params=None):
+    with fm.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        conn.rollback()
+    return rows
+
+
+def objetos(fm, prefijo: str) -> list:
+    # Tablas, índices y tipos ENUM cuyo nombre empieza con el prefijo
+    return [row[0] for row in consulta(
+        fm,
+        "SELECT relname FROM pg_class WHERE relnamespace = current_schema()::regnamespace "
+        "AND left(relname, %s) = %s UNION ALL "
+        "SELECT typname FROM pg_type WHERE typnamespace = current_schema()::regnamespace "
+        "AND typtype = 'e' AND left(typname, %s) = %s;",
+        (len(prefijo), prefijo, len(prefijo), prefijo))]
+
+
+def contar(fm) -> int:
+    return consulta(fm, f'SELECT count(*) FROM "{fm.table_name}";')[0][0]
+
+
+def version(fm):
+    return consulta(fm, "SELECT %s::regclass::oid, version FROM etl_control WHERE tabla = %s;",
+                    (f'"{fm.table_name}"', fm.table_name))[0]
+
+
+def verificar(condicion: bool, mensaje: str):
+    if not condicion:
+        raise AssertionError(mensaje)
+    print(f"✅ {mensaje}")
+
+
+def probar_recarga(fm):
+    df = datos_prueba(5_000)
+    fm.save_chunks_to_postgresql_copy([df.iloc[:2_000], df.iloc[2_000:]])
+    verificar(contar(fm) == len(df), "recarga completa: todas las filas de todos los bloques")
+    leido = pd.DataFrame(consulta(fm, f'SELECT id, adr FROM "{fm.table_name}" ORDER BY id;'), columns=['id', 'adr'])
+    verificar(np.allclose(leido['adr'].to_numpy(dtype='float64'), df['adr'].to_numpy(dtype='float64')),
+              "recarga completa: valores iguales a los enviados")
+
+    oid, version_anterior = version(fm)
+    fm.save_chunks_to_postgresql_copy([datos_prueba(1_000, seed=1)])
+    nuevo_oid, nueva_version = version(fm)
+    verificar(contar(fm) == 1_000 and nuevo_oid != oid and nueva_version == version_anterior + 1,
+              "intercambio: la tabla nueva reemplaza a la anterior y la versión aumenta")
+    verificar(not objetos(fm, fm.table_name + "__"),
+              "intercambio: sin tablas, índices ni ENUM con el nombre temporal")
+
+
+def probar_upsert(fm):
+    df = datos_prueba(1_300)
+    fm.save_chunks_to_postgresql_copy([df.iloc[:1_000]])
+    # El lote trae 200 llaves existentes con otro adr (mismo año y mes) y repite una llave
+    lote = df.iloc[800:].assign(adr=df['adr'].iloc[800:] + 1)
+    lote = pd.concat([lote, lote.iloc[[0]]], ignore_index=True)
+    fm.merge_chunks_to_postgresql([lote.iloc[:250], lote.iloc[250:]])
+    verificar(contar(fm) == 1_300, "upsert: las llaves repetidas no se duplican")
+    adr = consulta(fm, f'SELECT adr FROM "{fm.table_name}" WHERE id = 900;')[0][0]
+    esperado = float(lote.loc[lote['id'] == 900, 'adr'].iloc[0])
+    verificar(abs(adr - esperado) < 1e-3, "upsert: la fila existente toma los valores del lote")
+
+
+def probar_particiones(fm):
+    df = datos_prueba(3_000)
+    fm.save_chunks_to_postgresql_copy([df.iloc[:1_500], df.iloc[1_500:]])
+    particiones = set(objetos(fm, fm.table_name + "_"))
+    esperadas = {f"{fm.table_name}_{year}_{month.lower()}" for year in (2015, 2016, 2017) for month in MESES}
+    verificar(esperadas <= particiones, "particiones: una por año y mes presentes en los datos")
+    en_default = consulta(fm, f'SELECT count(*) FROM "{fm.table_name}_default";')[0][0]
+    verificar(en_default == 0 and contar(fm) == len(df), "particiones: cada fila cae en la partición de su año y mes")
+
+
+def main():
+    if not os.environ.get("PG_DSN"):
+        print("⚠️ PG_DSN no está definido; no se ejecutan las verificaciones de PostgreSQL.")
+        return 0
+
+    from file_manager import FileManager
+    prefijo = f"prueba_etl_{uuid.uuid4().hex[:8]}"
+    casos = [
+        (probar_recarga, {}),
+        (probar_recarga, {'binary_copy': True}),
+        (probar_upsert, {'upsert_key': ['id']}),
+        (probar_particiones, {'partitioned': True}),
+        (probar_upsert, {'upsert_key': ['id'], 'partitioned': True}),
+    ]
+    fallas = 0
+    for i, (prueba, opciones) in enumerate(casos):
+        fm = FileManager(**opciones)
+        fm.table_name = f"{prefijo}_{i}"
+        print(f"— {prueba.__name__} {opciones}")
+        try:
+            prueba(fm)
+        except Exception as e:
+            fallas += 1
+            print(f"❌ {e}")
+        finally:
+            enums = [row[0] for row in consulta(fm, "SELECT typname FROM pg_type WHERE typtype = 'e' "
+                                                    "AND left(typname, %s) = %s;",
+                                                (len(fm.table_name), fm.table_name))]
+            with fm.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS "{fm.table_name}";')
+                for nombre in enums:
+                    cursor.execute(f'DROP TYPE IF EXISTS "{nombre}";')
+                cursor.execute("DELETE FROM etl_control WHERE tabla = %s;", (fm.table_name,))
+                conn.commit()
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())